@@ -1,42 +1,498 @@
 from engine import Engine
-from move import Move
-from typing import List, Optional
+from bitboard import attackers_to, popcount
+from helpers import format_coordinate_move, get_opposite_color
+from move import Move, SCORE_PIECE
+from threading import Event
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
 from random import shuffle, choice
+from ordering import MAX_PLY, MoveOrderer
+from book import OpeningBook
+from bitbase import BITBASE_DIR, Bitbases
+from stats import SearchStats
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Captures that cannot lift the score to within this many pawns of alpha are not worth searching.
+DELTA_MARGIN = 2
+# Scores are whole hundredths of a pawn, so this is the narrowest window that can still fail high or low.
+NULL_WINDOW = 0.01
+# Aspiration windows that fail are widened by this factor, and opened fully once wider than the limit.
+ASPIRATION_GROWTH = 4
+ASPIRATION_LIMIT = 10
 
 
 class Ai:
 
-  def __init__(self, depth=3):
+  def __init__(self, depth=3, tt_size_mb: float = 16, time_limit: Optional[float] = None,
+               node_limit: Optional[int] = None, orderer: Optional[MoveOrderer] = None, quiescence_depth: int = 6,
+               color: str = 'b', book_path: Optional[str] = None, bitbase_dir: Optional[str] = BITBASE_DIR,
+               profile: bool = False, null_move: bool = True, null_move_reduction: int = 2, lmr: bool = True,
+               lmr_reduction: int = 1, lmr_min_moves: int = 3, aspiration_window: float = 0.5):
     # The depth determines the difficulty of the AI.
     # Note that moves will take longer to generate the higher this is set.
+    # With a time or node limit, depth is the deepest iteration the search will attempt.
     self.depth = depth
+    # The side the AI plays, black against a human in the GUI.
+    self.color = color
+    self.time_limit = time_limit
+    self.node_limit = node_limit
     self.next_move: Optional[Move] = None
+    # Nodes visited by the last search, the quiescence ones are counted in both.
+    self.nodes = 0
+    self.quiescence_nodes = 0
+    # How many captures deep the quiescence search may go at the leaves. Zero scores leaves statically.
+    self.quiescence_depth = quiescence_depth
+
+    # Iteration currently being searched, and the deepest one that finished.
+    self.root_depth = 0
+    self.completed_depth = 0
+    # Best move of the last completed iteration, searched first by the next one.
+    self.previous_best_move: Optional[Move] = None
+    self.deadline: Optional[float] = None
+    # Set from another thread to cancel the running search.
+    self.stop_event: Optional[Event] = None
+    self.stopped = False
+    # Best root score found by any process of a parallel search, see parallel.py.
+    # Replies to a root move then only need to prove that move is no better.
+    self.shared_alpha = None
+
+    # Kept between moves, positions from the previous search are often still relevant. Zero disables it.
+    self.transposition_table: Optional[TranspositionTable] = TranspositionTable(tt_size_mb) if tt_size_mb else None
+    self.orderer = orderer if orderer is not None else MoveOrderer()
+    # Opening moves are played from the book without searching, for as long as it knows the position.
+    self.book: Optional[OpeningBook] = OpeningBook(book_path) if book_path else None
+    # Positions with three pieces or fewer are scored from the endgame tables, loaded when first needed.
+    self.bitbases: Optional[Bitbases] = Bitbases(bitbase_dir) if bitbase_dir else None
+
+    # Null move pruning: when passing the turn still scores at least beta, a real move would too.
+    # The passing search is null_move_reduction plies shallower than a real move's.
+    self.null_move = null_move
+    self.null_move_reduction = null_move_reduction
+    # Late move reductions: quiet moves ordered after the first lmr_min_moves are searched lmr_reduction
+    # plies shallower, and again at full depth if they turn out better than alpha.
+    self.lmr = lmr
+    self.lmr_reduction = lmr_reduction
+    self.lmr_min_moves = lmr_min_moves
+
+    # From depth two on, iterations search a window this many pawns either side of the previous score first.
+    # Zero searches every iteration with the full window.
+    self.aspiration_window = aspiration_window
+
+    # Best line found by the last completed iteration, starting with its move. The next iteration searches it
+    # first, pv_followed is how many plies of it the current line still matches.
+    self.principal_variation: List[Move] = []
+    self.pv_followed = 0
+    # Line from each ply of the current search down, filled in as moves raise alpha.
+    self.pv_table: List[List[Move]] = [[] for _ in range(MAX_PLY + 1)]
+
+    # What the last search did, see stats.py. With profile, move generation and evaluation are timed as well.
+    self.stats = SearchStats()
+    self.profile = profile
+    self.search_started = 0.0
+
+  def find_optimal_move(self, engine: Engine, stop_event: Optional[Event] = None) -> Optional[Move]:
+    """
+    Iterative deepening from depth one up to self.depth, stopping early once the time or node limit is hit.
+    Returns the best move of the deepest iteration that completed.
+    The board is searched with the AI to move, and its side to move is put back afterwards.
+    :param stop_event: Cancels the search when set, even during the first iteration.
+    """
+    self.reset_search(stop_event)
+    # Keep the side folded into the hash consistent with the side the AI plays, for transposition lookups.
+    toggled = engine.board.to_move != self.color
+    if toggled:
+      engine.board.toggle_side()
+    try:
+      book_move = self.book_move(engine)
+      if book_move is not None:
+        self.next_move = book_move
+        self.stats.book_move = True
+        self.finish_search()
+        return book_move
+
+      best_move = self.iterative_deepening(engine)
+      self.next_move = best_move
+      self.finish_search()
+      return best_move
+    finally:
+      if toggled:
+        engine.board.toggle_side()
+
+  def iterative_deepening(self, engine: Engine) -> Optional[Move]:
+    """
+    The search itself, once the position is known not to be in the book.
+    :returns: The best move of the deepest iteration that completed.
+    """
+    self.orderer.new_search()
+
+    # Ordering is stable, so shuffling first still varies the choice between equally scored moves.
+    root_moves = list(self.own_moves(engine))
+    shuffle(root_moves)
+    best_move: Optional[Move] = None
+    score: Optional[float] = None
+
+    for depth in range(1, self.depth + 1):
+      if self.stop_event is not None and self.stop_event.is_set():
+        break
+      self.root_depth = depth
+      self.next_move = None
+      nodes, started = self.nodes, perf_counter()
+      score = self.search_aspiration(root_moves, engine, depth, score)
+      if self.stopped:
+        break
+
+      self.completed_depth = depth
+      self.stats.add_iteration(depth, self.nodes - nodes, perf_counter() - started)
+      # When every move is mated no move beats the others, keep the last iteration's or take the first one.
+      if self.next_move is None and root_moves:
+        self.next_move = self.previous_best_move or root_moves[0]
+      best_move = self.previous_best_move = self.next_move
+      if best_move is not None:
+        line = self.pv_table[0]
+        self.principal_variation = line if line and line[0] == best_move else [best_move]
+        self.stats.pv = [format_coordinate_move(move) for move in self.principal_variation]
+      if self.out_of_budget():
+        break
+    return best_move
+
+  def search(self, engine: Engine,
+             stop_event: Optional[Event] = None) -> Tuple[Optional[Move], List[Move], SearchStats]:
+    """
+    find_optimal_move, returning the principal variation and what the search did along with the move.
+    """
+    move = self.find_optimal_move(engine, stop_event)
+    return move, self.principal_variation, self.stats
 
-  def find_optimal_move(self, engine: Engine) -> Optional[Move]:
+  def search_aspiration(self, root_moves: List[Move], engine: Engine, depth: int,
+                        previous_score: Optional[float]) -> float:
+    """
+    Searches one iteration in a window around the previous iteration's score. A score outside the window is
+    only a bound, so the window is widened on that side and the iteration searched again.
+    """
+    if previous_score is None or not self.aspiration_window:
+      return self.search_root(root_moves, engine, depth, -10000, 10000)
+
+    delta = self.aspiration_window
+    alpha, beta = max(-10000, previous_score - delta), min(10000, previous_score + delta)
+    while True:
+      score = self.search_root(root_moves, engine, depth, alpha, beta)
+      if self.stopped:
+        return score
+
+      if score <= alpha and alpha > -10000:
+        delta *= ASPIRATION_GROWTH
+        alpha = max(-10000, previous_score - delta) if delta < ASPIRATION_LIMIT else -10000
+      elif score >= beta and beta < 10000:
+        delta *= ASPIRATION_GROWTH
+        beta = min(10000, previous_score + delta) if delta < ASPIRATION_LIMIT else 10000
+      else:
+        return score
+      self.stats.aspiration_researches += 1
+
+  def reset_search(self, stop_event: Optional[Event] = None):
+    """
+    Clears the counters and the result of the previous search and starts the clock.
+    """
+    self.stop_event = stop_event
     self.next_move = None
-    shuffle(engine.black_moves)
-    self.find_alpha_beta_prune_move(engine.black_moves, engine, self.depth, -10000, 10000, -1)
-    return self.next_move
+    self.nodes = 0
+    self.quiescence_nodes = 0
+    self.completed_depth = 0
+    self.previous_best_move = None
+    self.principal_variation = []
+    self.pv_followed = 0
+    self.stopped = False
+    self.search_started = perf_counter()
+    self.deadline = self.search_started + self.time_limit if self.time_limit is not None else None
+
+    self.stats = SearchStats()
+    # Table and bitbase counters run across searches, the stats take the difference.
+    if self.transposition_table is not None:
+      self.stats.tt_probes, self.stats.tt_hits = -self.transposition_table.probes, -self.transposition_table.hits
+    if self.bitbases is not None:
+      self.stats.bitbase_hits = -self.bitbases.hits
+
+  def finish_search(self):
+    stats = self.stats
+    stats.depth = self.completed_depth
+    stats.nodes = self.nodes
+    stats.quiescence_nodes = self.quiescence_nodes
+    stats.time = perf_counter() - self.search_started
+    if self.transposition_table is not None:
+      stats.tt_probes += self.transposition_table.probes
+      stats.tt_hits += self.transposition_table.hits
+    if self.bitbases is not None:
+      stats.bitbase_hits += self.bitbases.hits
+
+  def search_root(self, root_moves: List[Move], engine: Engine, depth: int, alpha: float, beta: float) -> float:
+    """
+    Searches one iteration from the root, leaving the best move in self.next_move and its line in pv_table[0].
+    """
+    return self.find_alpha_beta_prune_move(root_moves, engine, depth, alpha, beta, self.turn_multiplier)
+
+  def book_move(self, engine: Engine) -> Optional[Move]:
+    """
+    A move from the opening book for the current position, if there is a book and it has one.
+    """
+    if self.book is None:
+      return None
+    # Book positions are stored with the side to move in the hash.
+    toggled = engine.board.to_move != self.color
+    if toggled:
+      engine.board.toggle_side()
+    move = self.book.choose(engine.board, self.own_moves(engine))
+    if toggled:
+      engine.board.toggle_side()
+    return move
+
+  @property
+  def search_settings(self) -> Dict:
+    """
+    Settings that change which nodes get searched, for processes that search alongside this one.
+    """
+    return {'null_move': self.null_move, 'null_move_reduction': self.null_move_reduction, 'lmr': self.lmr,
+            'lmr_reduction': self.lmr_reduction, 'lmr_min_moves': self.lmr_min_moves}
+
+  @property
+  def turn_multiplier(self) -> int:
+    """
+    Sign that turns white's point of view (Board.score_board) into the AI's.
+    """
+    return 1 if self.color == 'w' else -1
+
+  def own_moves(self, engine: Engine) -> List[Move]:
+    return engine.white_moves if self.color == 'w' else engine.black_moves
+
+  def out_of_budget(self) -> bool:
+    if self.deadline is not None and perf_counter() >= self.deadline:
+      return True
+    return self.node_limit is not None and self.nodes >= self.node_limit
+
+  def should_stop(self) -> bool:
+    """
+    Polled every 256 nodes. Cancellation applies at once, the budget only after the first iteration
+    so that there is always a move to fall back on.
+    """
+    if self.stop_event is not None and self.stop_event.is_set():
+      return True
+    return self.root_depth > 1 and self.out_of_budget()
+
+  def find_alpha_beta_prune_move(self, valid_moves: Optional[List[Move]], engine: Engine, depth: int,
+                                 alpha: float, beta: float, turn_multiplier: int, ply: int = 0,
+                                 allow_null: bool = True) -> float:
+    """
+    Principal variation search: negamax with alpha-beta pruning, where every move after the first is searched
+    with a null window to prove it is no better, and searched again in full only when it is.
+    Adds null move pruning and late move reductions.
+    :param valid_moves: Moves for the side to play, generated on demand when None.
+    :param ply: Distance from the root, used for the killer moves.
+    :param allow_null: False right after a null move, two in a row would just search the same position again.
+    """
+    self.nodes += 1
+    if self.nodes & 255 == 0 and self.should_stop():
+      self.stopped = True
+    if self.stopped:
+      return 0
+    self.pv_table[ply] = []
+
+    if ply > 0 and self.bitbases is not None:
+      score = self.bitbases.probe(engine.board, 'w' if turn_multiplier == 1 else 'b')
+      if score is not None:
+        return score
 
-  def find_alpha_beta_prune_move(self, valid_moves: List[Move], engine: Engine, depth: int,
-                                 alpha: int, beta: int, turn_multiplier: int) -> int:
     if depth == 0:
-      return turn_multiplier * engine.board.score_board()
+      return self.quiescence(engine, alpha, beta, turn_multiplier, ply, 0)
+
+    key = engine.board.hash
+    hash_move: Optional[Move] = None
+    if self.transposition_table is not None:
+      entry = self.transposition_table.probe(key)
+      if entry is not None:
+        hash_move = entry.move
+        # The root always searches so that next_move gets set.
+        if entry.depth >= depth and depth != self.root_depth:
+          if entry.bound == EXACT:
+            return entry.score
+          elif entry.bound == LOWER_BOUND:
+            alpha = max(alpha, entry.score)
+          else:
+            beta = min(beta, entry.score)
+          if alpha >= beta:
+            return entry.score
+    # The bound stored at the end is relative to the window actually searched, which the entry may have narrowed.
+    original_alpha = alpha
+
+    c = 'w' if turn_multiplier == 1 else 'b'
+    in_check = (self.null_move or self.lmr) and ply > 0 and self.in_check(engine, c)
+
+    if self.null_move and allow_null and ply > 0 and depth > self.null_move_reduction and not in_check:
+      score = self.null_move_search(engine, depth, beta, turn_multiplier, ply)
+      if score is not None:
+        return score
+
+    if valid_moves is None:
+      valid_moves = self.generate_moves(engine, c)
+    # Along the previous iteration's best line, its move is searched first.
+    on_pv = self.pv_followed == ply and ply < len(self.principal_variation)
+    if on_pv:
+      hash_move = self.principal_variation[ply]
+    valid_moves = self.orderer.order(valid_moves, engine.board, ply, hash_move)
+    # A failed null move verification may have left a line behind.
+    self.pv_table[ply] = []
 
     max_score = -10000
+    best_move: Optional[Move] = None
 
-    for move in valid_moves:
+    # Reducing is only worth it with a few plies left, and a check must always be answered at full depth.
+    can_reduce = self.lmr and depth >= 3 and not in_check
+
+    for index, move in enumerate(valid_moves):
+      if ply == 1 and self.shared_alpha is not None:
+        beta = min(beta, -self.shared_alpha.value)
+        # Another process already found a root move at least as good as this one can be.
+        if max_score >= beta:
+          if best_move is None:
+            return beta
+          break
+      follows_pv = on_pv and move == self.principal_variation[ply]
+      if follows_pv:
+        self.pv_followed = ply + 1
       engine.board.make_move(move)
-      valid_opposing_moves = engine.generate_valid_moves('w' if turn_multiplier == -1 else 'b')
-      score = -self.find_alpha_beta_prune_move(valid_opposing_moves, engine, depth - 1, -beta, -alpha, -turn_multiplier)
+      if index == 0:
+        score = -self.find_alpha_beta_prune_move(None, engine, depth - 1, -beta, -alpha, -turn_multiplier, ply + 1)
+      else:
+        if can_reduce and index >= self.lmr_min_moves and move.captured_piece is None and not move.promote and \
+            not self.in_check(engine, get_opposite_color(c)):
+          self.stats.lmr_reductions += 1
+          reduced_depth = max(1, depth - 1 - self.lmr_reduction)
+          score = -self.find_alpha_beta_prune_move(None, engine, reduced_depth, -alpha - NULL_WINDOW, -alpha,
+                                                   -turn_multiplier, ply + 1)
+          # Better than expected at the reduced depth, check again at full depth.
+          if score > alpha and not self.stopped:
+            self.stats.lmr_researches += 1
+            score = -self.find_alpha_beta_prune_move(None, engine, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                     -turn_multiplier, ply + 1)
+        else:
+          score = -self.find_alpha_beta_prune_move(None, engine, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                   -turn_multiplier, ply + 1)
+        # Better than the first move after all, find out by how much with the full window.
+        if alpha < score < beta and not self.stopped:
+          self.stats.pvs_researches += 1
+          score = -self.find_alpha_beta_prune_move(None, engine, depth - 1, -beta, -alpha, -turn_multiplier,
+                                                   ply + 1)
+      engine.board.undo_move(move)
+      if follows_pv:
+        self.pv_followed = ply
+      # The score of an interrupted search is meaningless, unwind without using or storing it.
+      if self.stopped:
+        return 0
 
       if score > max_score:
         max_score = score
+        best_move = move
         # Best move for the provided board.
-        if depth == self.depth:
+        if depth == self.root_depth:
           self.next_move = move
 
+      if max_score > alpha:
+        alpha = max_score
+        self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+      if alpha >= beta:
+        self.orderer.record_cutoff(engine.board, move, ply, depth)
+        self.stats.beta_cutoffs += 1
+        if move is valid_moves[0]:
+          self.stats.first_move_cutoffs += 1
+        break
+
+    if self.transposition_table is not None:
+      if max_score <= original_alpha:
+        bound = UPPER_BOUND
+      elif max_score >= beta:
+        bound = LOWER_BOUND
+      else:
+        bound = EXACT
+      self.transposition_table.store(key, depth, max_score, bound, best_move)
+
+    return max_score
+
+  def null_move_search(self, engine: Engine, depth: int, beta: float, turn_multiplier: int,
+                       ply: int) -> Optional[float]:
+    """
+    Lets the opponent move twice in a row. If we still hold beta, the node can be cut off without searching
+    any of our moves. Returns beta in that case, otherwise None.
+    Passing is never better than moving in zugzwang, which is common when a side is down to pawns, so it is
+    skipped then. With a single piece left, a cutoff is only trusted after a verification search of our moves.
+    """
+    board = engine.board
+    c = 'w' if turn_multiplier == 1 else 'b'
+    pieces = popcount(board.bitboards[c + 'N'] | board.bitboards[c + 'B'] | board.bitboards[c + 'R'] |
+                      board.bitboards[c + 'Q'])
+    if not pieces or turn_multiplier * self.evaluate(engine) < beta:
+      return None
+
+    reduced_depth = depth - 1 - self.null_move_reduction
+    board.toggle_side()
+    score = -self.find_alpha_beta_prune_move(None, engine, reduced_depth, -beta, -beta + NULL_WINDOW,
+                                             -turn_multiplier, ply + 1, allow_null=False)
+    board.toggle_side()
+    if self.stopped or score < beta:
+      return None
+
+    if pieces == 1:
+      score = self.find_alpha_beta_prune_move(None, engine, depth - self.null_move_reduction, beta - NULL_WINDOW,
+                                              beta, turn_multiplier, ply, allow_null=False)
+      if self.stopped or score < beta:
+        return None
+
+    self.stats.null_move_cutoffs += 1
+    return beta
+
+  @staticmethod
+  def in_check(engine: Engine, c: str) -> bool:
+    king = engine.board.bitboards[c + 'K']
+    return king != 0 and attackers_to(engine.board.bitboards, engine.board.occupied, king.bit_length() - 1,
+                                      get_opposite_color(c)) != 0
+
+  def quiescence(self, engine: Engine, alpha: float, beta: float, turn_multiplier: int, ply: int,
+                 capture_depth: int) -> float:
+    """
+    Searches captures only until the position is quiet, so leaves are not scored in the middle of an exchange.
+    The side to move may always stand pat on the static score instead of capturing.
+    """
+    if capture_depth > 0:
+      self.nodes += 1
+      self.quiescence_nodes += 1
+      if self.nodes & 255 == 0 and self.should_stop():
+        self.stopped = True
+      if self.stopped:
+        return 0
+
+    stand_pat = turn_multiplier * self.evaluate(engine)
+    if stand_pat >= beta or capture_depth >= self.quiescence_depth:
+      return stand_pat
+    # Not even winning a queen would get back to alpha.
+    if stand_pat + SCORE_PIECE['Q'] + DELTA_MARGIN < alpha:
+      return stand_pat
+    if stand_pat > alpha:
+      alpha = stand_pat
+
+    captures = self.generate_moves(engine, 'w' if turn_multiplier == 1 else 'b', captures_only=True)
+    max_score = stand_pat
+    for move in self.orderer.order(captures, engine.board, ply):
+      gain = SCORE_PIECE[move.captured_piece[1]] if move.captured_piece is not None else 0
+      if move.promote:
+        gain += SCORE_PIECE['Q'] - SCORE_PIECE['P']
+      if stand_pat + gain + DELTA_MARGIN < alpha:
+        continue
+
+      engine.board.make_move(move)
+      score = -self.quiescence(engine, -beta, -alpha, -turn_multiplier, ply + 1, capture_depth + 1)
       engine.board.undo_move(move)
+      if self.stopped:
+        return 0
+
+      if score > max_score:
+        max_score = score
       if max_score > alpha:
         alpha = max_score
       if alpha >= beta:
@@ -44,21 +500,46 @@ class Ai:
 
     return max_score
 
+  def generate_moves(self, engine: Engine, c: str, captures_only: bool = False) -> List[Move]:
+    generate = engine.generate_valid_captures if captures_only else engine.generate_valid_moves
+    if not self.profile:
+      return generate(c)
+    start = perf_counter()
+    moves = generate(c)
+    self.stats.movegen_time += perf_counter() - start
+    return moves
+
+  def evaluate(self, engine: Engine) -> float:
+    """
+    Static score of the board from white's point of view.
+    """
+    if not self.profile:
+      return engine.board.score_board()
+    start = perf_counter()
+    score = engine.board.score_board()
+    self.stats.eval_time += perf_counter() - start
+    return score
+
   def make_optimal_move(self, engine: Engine) -> bool:
     """
     Makes the in most cases the optimal move, and then checks the game state.
     :return: Whether the game is over or not.
     """
-    engine.refresh_moves_and_game_state('b')
+    engine.refresh_moves_and_game_state(self.color)
 
-    optimal_move_maybe = self.find_optimal_move(engine)
+    return self.play_move(engine, self.find_optimal_move(engine))
 
+  def play_move(self, engine: Engine, optimal_move_maybe: Optional[Move]) -> bool:
+    """
+    Plays a move found by the search (or a random one when it found none), and then checks the game state.
+    :return: Whether the game is over or not.
+    """
     if optimal_move_maybe is None:
-      optimal_move_maybe = choice(engine.black_moves)
+      optimal_move_maybe = choice(self.own_moves(engine))
 
     engine.board.make_move(optimal_move_maybe)
 
-    engine.refresh_moves_and_game_state('w')
+    engine.refresh_moves_and_game_state(get_opposite_color(self.color))
     engine.board.log_move(optimal_move_maybe, engine.in_check, engine.checkmate)
 
     return engine.check_game_over()
@@ -0,0 +1,127 @@
+"""
+Scores many positions at once with NumPy, for analysis and data work rather than the search.
+Gives exactly Board.score_board for every position.
+
+Usage: python3 batch.py [--positions N]
+"""
+from argparse import ArgumentParser
+from random import choice, seed
+from time import perf_counter
+from typing import Iterable, List
+
+try:
+  import numpy as np  # type: ignore
+except ImportError:
+  np = None
+
+from bitboard import PIECES
+from board import Board, SQUARE_SCORES
+from engine import Engine
+from helpers import get_opposite_color
+
+
+def _require_numpy():
+  if np is None:
+    raise ImportError('Batch evaluation needs NumPy, install it with pip install numpy.')
+
+
+def encode_planes(boards: Iterable[Board]) -> 'np.ndarray':
+  """
+  One 0/1 plane of 64 squares per piece, in the order of bitboard.PIECES, as an (N, 12, 64) uint8 array.
+  Squares are indexed as j * 8 + i, the same as the bitboards they are unpacked from.
+  """
+  _require_numpy()
+  data = b''.join(board.bitboards[piece].to_bytes(8, 'little') for board in boards for piece in PIECES)
+  return np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(-1, len(PIECES), 8), axis=2, bitorder='little')
+
+
+def encode_squares(boards: Iterable[Board]) -> 'np.ndarray':
+  """
+  The piece on every square, as an (N, 64) int8 array: zero when empty, otherwise its index in PIECES plus one.
+  """
+  planes = encode_planes(boards)
+  codes = np.arange(1, len(PIECES) + 1, dtype=np.int8)
+  return np.einsum('npq,p->nq', planes.astype(np.int8), codes).astype(np.int8)
+
+
+def square_score_table() -> 'np.ndarray':
+  """
+  Board.SQUARE_SCORES as a (12, 64) array of hundredths of a pawn, material and placement together.
+  """
+  _require_numpy()
+  return np.array([SQUARE_SCORES[piece] for piece in PIECES], dtype=np.int64)
+
+
+def evaluate(encoded: 'np.ndarray') -> 'np.ndarray':
+  """
+  Scores a batch of positions from white's point of view, like Board.score_board.
+  :param encoded: Boards from encode_planes or encode_squares.
+  :returns: An (N,) float64 array of scores in pawns.
+  """
+  _require_numpy()
+  table = square_score_table()
+  if encoded.ndim == 3:
+    # One float matrix product, which NumPy hands to BLAS unlike an integer one. Every partial sum is a whole
+    # number of hundredths far below 2 ** 24, so even float32 is exact and the division below, done in float64,
+    # rounds exactly as score_board does.
+    hundredths = (encoded.reshape(len(encoded), -1).astype(np.float32)
+                  @ table.reshape(-1).astype(np.float32)).astype(np.float64)
+  elif encoded.ndim == 2:
+    # Row zero scores the empty squares.
+    padded = np.vstack([np.zeros((1, 64), dtype=np.int64), table])
+    hundredths = padded[encoded.astype(np.intp), np.arange(64)].sum(axis=1)
+  else:
+    raise ValueError(f"Expected an (N, 12, 64) or (N, 64) array, got shape {encoded.shape}.")
+  return hundredths / 100
+
+
+def random_positions(count: int, max_plies: int = 60) -> List[Board]:
+  """
+  Positions from random games, for testing and timing.
+  """
+  boards = []
+  while len(boards) < count:
+    board = Board()
+    engine = Engine(board)
+    c = 'w'
+    for _ in range(max_plies):
+      moves = engine.generate_valid_moves(c)
+      if not moves:
+        break
+      board.make_move(choice(moves))
+      c = get_opposite_color(c)
+      boards.append(board.copy())
+  return boards[:count]
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--positions', type=int, default=10000)
+  args = parser.parse_args()
+  _require_numpy()
+
+  seed(0)
+  boards = random_positions(args.positions)
+
+  start = perf_counter()
+  expected = [board.compute_score() / 100 for board in boards]
+  loop_time = perf_counter() - start
+
+  print(f"Positions: {len(boards)}")
+  print(f"Loop over boards: {loop_time:.3f}s")
+  for encode in (encode_planes, encode_squares):
+    start = perf_counter()
+    encoded = encode(boards)
+    encode_time = perf_counter() - start
+
+    start = perf_counter()
+    scores = evaluate(encoded)
+    batch_time = perf_counter() - start
+
+    assert scores.tolist() == expected, 'Batch scores differ from Board.compute_score.'
+    print(f"{encode.__name__}: {encode_time:.3f}s, evaluate: {batch_time:.4f}s "
+          f"({loop_time / batch_time:.0f}x the loop, {loop_time / (encode_time + batch_time):.1f}x with encoding)")
+
+
+if __name__ == '__main__':
+  main()
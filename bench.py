@@ -0,0 +1,79 @@
+"""
+Measures how much each move-ordering stage, and then each selective search technique, shrinks the search tree
+at a fixed depth.
+
+Usage: python3 bench.py [--depth N]
+"""
+from argparse import ArgumentParser
+from random import seed
+from time import perf_counter
+from typing import Callable, Dict, List
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from ordering import MoveOrderer
+
+# Black to move in each of these, since the AI plays black.
+POSITIONS = {
+  'open game': 'e2e4',
+  'italian': 'e2e4 e7e5 g1f3 b8c6 f1c4',
+  'queens gambit': 'd2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5',
+  'sicilian': 'e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3',
+}
+
+CONFIGURATIONS = {
+  'none': dict(hash_move=False, captures=False, killers=False, history=False),
+  'hash': dict(hash_move=True, captures=False, killers=False, history=False),
+  'hash+mvv-lva': dict(hash_move=True, captures=True, killers=False, history=False),
+  'hash+mvv-lva+killers': dict(hash_move=True, captures=True, killers=True, history=False),
+  'all': dict(hash_move=True, captures=True, killers=True, history=True),
+}
+
+# With all of the move ordering, which the reductions depend on.
+SELECTIVE_CONFIGURATIONS = {
+  'full width': dict(null_move=False, lmr=False),
+  'null move': dict(null_move=True, lmr=False),
+  'lmr': dict(null_move=False, lmr=True),
+  'null move+lmr': dict(null_move=True, lmr=True),
+}
+
+
+def setup_position(moves: List[str]) -> Engine:
+  engine = Engine(Board())
+  engine.refresh_moves_and_game_state(engine.apply_coordinate_moves(moves))
+  return engine
+
+
+def run(configurations: Dict[str, Dict], make_ai: Callable[[Dict], Ai]):
+  print(f"{'configuration':<22} {'nodes':>10} {'seconds':>9} {'reduction':>10}")
+  baseline = None
+  for name, flags in configurations.items():
+    nodes = 0
+    start = perf_counter()
+    for moves in POSITIONS.values():
+      # The root moves are shuffled for variety, fix the seed so every configuration sees the same order.
+      seed(0)
+      ai = make_ai(flags)
+      ai.find_optimal_move(setup_position(moves.split()))
+      nodes += ai.nodes
+    elapsed = perf_counter() - start
+
+    if baseline is None:
+      baseline = nodes
+    print(f"{name:<22} {nodes:>10} {elapsed:>9.2f} {baseline / nodes:>9.1f}x")
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--depth', type=int, default=4)
+  args = parser.parse_args()
+
+  # Full width, so that only the ordering differs.
+  run(CONFIGURATIONS, lambda flags: Ai(depth=args.depth, orderer=MoveOrderer(**flags), null_move=False, lmr=False))
+  print()
+  run(SELECTIVE_CONFIGURATIONS, lambda flags: Ai(depth=args.depth, **flags))
+
+
+if __name__ == '__main__':
+  main()
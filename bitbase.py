@@ -0,0 +1,240 @@
+"""
+Endgame tables for a lone king against king and queen, king and rook, or king and pawn.
+Every position stores its distance to mate, found by retrograde analysis over the moves Engine generates.
+
+Usage: python3 bitbase.py [KQK KRK KPK] [--output DIR]
+"""
+import os
+import zlib
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from bitboard import KING_ATTACKS, attackers_to, popcount, square
+from board import Board
+from engine import Engine
+
+BITBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bitbases')
+# Material sets by the extra piece of the stronger side. KPK needs KQK for its promotions, so it comes last.
+TABLES = {'KQK': 'Q', 'KRK': 'R', 'KPK': 'P'}
+
+# Positions are indexed by side to move (0 for the stronger side), then its king, the lone king and its piece.
+TABLE_SIZE = 2 * 64 * 64 * 64
+# A win in n plies scores this minus n, so the winner mates as soon as it can and the loser holds out longest.
+WIN_SCORE = 9000
+
+
+def table_index(stronger_to_move: bool, strong_king: int, weak_king: int, piece: int) -> int:
+  return (((0 if stronger_to_move else 1) << 6 | strong_king) << 6 | weak_king) << 6 | piece
+
+
+def generate_table(piece_type: str, promotions: Optional[bytearray] = None) -> bytearray:
+  """
+  Builds the table for king and piece_type against king, with white as the stronger side.
+  Each byte holds the plies to mate plus one, with zero for draws and impossible positions.
+  Moves that capture the piece lead to a draw, promotions are looked up in promotions (the KQK table).
+  """
+  board = Board(is_test_board=True)
+  board.clear_board()
+  engine = Engine(board)
+  rows = board.board
+
+  distances = bytearray(TABLE_SIZE)
+  # Moves of the lone king that are not yet known to lose, and the positions one move before each position.
+  remaining = bytearray(TABLE_SIZE)
+  predecessors: List[Optional[List[int]]] = [None] * TABLE_SIZE
+  mated: List[int] = []
+  # Positions of the stronger side that promote into a won KQK position, keyed by the plies that are left.
+  promoting: Dict[int, List[int]] = {}
+
+  for strong_king in range(64):
+    for weak_king in range(64):
+      if strong_king == weak_king or KING_ATTACKS[strong_king] >> weak_king & 1:
+        continue
+      for piece in range(64):
+        if piece in (strong_king, weak_king) or (piece_type == 'P' and piece >> 3 in (0, 7)):
+          continue
+
+        rows[strong_king >> 3][strong_king & 7] = 'wK'
+        rows[weak_king >> 3][weak_king & 7] = 'bK'
+        rows[piece >> 3][piece & 7] = 'w' + piece_type
+        board.wk_pos = (strong_king & 7, strong_king >> 3)
+        board.bk_pos = (weak_king & 7, weak_king >> 3)
+
+        # With white to move, black must not be in check.
+        if not attackers_to(board.bitboards, board.occupied, weak_king, 'w'):
+          position = table_index(True, strong_king, weak_king, piece)
+          for move in engine.generate_valid_moves('w'):
+            destination = square(move.ni, move.nj)
+            if move.promote:
+              distance = promotions[table_index(False, strong_king, weak_king, destination)]
+              if distance:
+                promoting.setdefault(distance - 1, []).append(position)
+              continue
+            if board.board[move.j][move.i][1] == 'K':
+              successor = table_index(False, destination, weak_king, piece)
+            else:
+              successor = table_index(False, strong_king, weak_king, destination)
+            if predecessors[successor] is None:
+              predecessors[successor] = []
+            predecessors[successor].append(position)
+
+        position = table_index(False, strong_king, weak_king, piece)
+        moves = engine.generate_valid_moves('b')
+        if not moves and engine.in_check:
+          mated.append(position)
+        remaining[position] = len(moves)
+        for move in moves:
+          # Taking the piece draws, so that move never counts as lost.
+          if move.captured_piece is None:
+            successor = table_index(True, strong_king, square(move.ni, move.nj), piece)
+            if predecessors[successor] is None:
+              predecessors[successor] = []
+            predecessors[successor].append(position)
+
+        rows[strong_king >> 3][strong_king & 7] = '--'
+        rows[weak_king >> 3][weak_king & 7] = '--'
+        rows[piece >> 3][piece & 7] = '--'
+
+  # Breadth first from the mates: a position of the stronger side wins as soon as one move reaches a lost
+  # position, one of the lone king loses once every move reaches a won position.
+  for position in mated:
+    distances[position] = 1
+  frontier = mated
+  plies = 0
+  while frontier or any(key >= plies for key in promoting):
+    won: List[int] = []
+    for lost in frontier:
+      for position in predecessors[lost] or ():
+        if not distances[position]:
+          distances[position] = plies + 2
+          won.append(position)
+    for position in promoting.pop(plies, ()):
+      if not distances[position]:
+        distances[position] = plies + 2
+        won.append(position)
+
+    frontier = []
+    for position in won:
+      for lost in predecessors[position] or ():
+        remaining[lost] -= 1
+        if not remaining[lost]:
+          distances[lost] = plies + 3
+          frontier.append(lost)
+    plies += 2
+    if plies + 3 > 255:
+      raise ValueError(f"Distances in {piece_type} do not fit in a byte.")
+
+  return distances
+
+
+class Bitbase:
+  """
+  One table, read from its compressed file the first time a position is probed.
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self.table: Optional[bytes] = None
+    self.missing = False
+
+  def load(self) -> Optional[bytes]:
+    if self.table is None and not self.missing:
+      if not os.path.exists(self.path):
+        self.missing = True
+        return None
+      with open(self.path, 'rb') as file:
+        table = zlib.decompress(file.read())
+      if len(table) != TABLE_SIZE:
+        raise ValueError(f"{self.path} has {len(table)} positions, expected {TABLE_SIZE}.")
+      self.table = table
+    return self.table
+
+
+class Bitbases:
+  """
+  Scores positions with three pieces left from the tables, and ones that cannot be won (KK, KNK, KBK) as draws.
+  """
+
+  def __init__(self, directory: str = BITBASE_DIR):
+    self.tables = {piece_type: Bitbase(os.path.join(directory, name + '.bin')) for name, piece_type in TABLES.items()}
+    self.hits = 0
+
+  def probe(self, board: Board, c: str) -> Optional[int]:
+    """
+    Score of the position for c, the side to move, or None when it is not covered.
+    Wins and losses are scored from WIN_SCORE less the plies to mate, draws as zero.
+    """
+    pieces = popcount(board.occupied)
+    if pieces > 3:
+      return None
+    if pieces == 2:
+      self.hits += 1
+      return 0
+
+    bitboards = board.bitboards
+    for strong in 'wb':
+      for piece_type, table in self.tables.items():
+        piece = bitboards[strong + piece_type]
+        if piece:
+          break
+      else:
+        continue
+      break
+    else:
+      # A lone minor piece cannot mate.
+      self.hits += 1
+      return 0
+
+    table = table.load()
+    if table is None:
+      return None
+
+    # Tables have white as the stronger side, mirror the ranks when it is black.
+    flip = 56 if strong == 'b' else 0
+    weak = 'b' if strong == 'w' else 'w'
+    strong_king = (bitboards[strong + 'K'].bit_length() - 1) ^ flip
+    weak_king = (bitboards[weak + 'K'].bit_length() - 1) ^ flip
+    distance = table[table_index(c == strong, strong_king, weak_king, (piece.bit_length() - 1) ^ flip)]
+
+    self.hits += 1
+    if not distance:
+      return 0
+    return WIN_SCORE - (distance - 1) if c == strong else distance - 1 - WIN_SCORE
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('tables', nargs='*', help=f"Tables to generate, all of {', '.join(TABLES)} by default.")
+  parser.add_argument('--output', default=BITBASE_DIR)
+  args = parser.parse_args()
+  args.tables = args.tables or list(TABLES)
+  for name in args.tables:
+    if name not in TABLES:
+      parser.error(f"Unknown table {name}, choose from {', '.join(TABLES)}.")
+
+  os.makedirs(args.output, exist_ok=True)
+  generated: Dict[str, bytearray] = {}
+  for name in TABLES:
+    if name not in args.tables:
+      continue
+    promotions = None
+    if name == 'KPK':
+      promotions = generated.get('KQK') or Bitbases(args.output).tables['Q'].load()
+      if promotions is None:
+        raise SystemExit('KPK needs the KQK table, generate it first.')
+
+    start = perf_counter()
+    distances = generate_table(TABLES[name], promotions)
+    generated[name] = distances
+    path = os.path.join(args.output, name + '.bin')
+    with open(path, 'wb') as file:
+      file.write(zlib.compress(bytes(distances), 9))
+
+    wins = sum(1 for distance in distances[:TABLE_SIZE // 2] if distance)
+    print(f"{name}: {wins} won positions with the stronger side to move, longest mate in "
+          f"{max(distances) // 2} moves, {os.path.getsize(path)} bytes, {perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,165 @@
+from typing import Dict, Iterator, List, Tuple
+
+from helpers import Movement
+
+# Squares are indexed as j * 8 + i, so bit 0 is a8 and bit 63 is h1.
+# This lines up with the board[j][i] view, so converting between the two is a shift and a mask.
+
+PIECE_TYPES = 'PNBRQK'
+PIECES = [c + p for c in 'wb' for p in PIECE_TYPES]
+
+ORTHOGONAL = Movement.King[:4]
+DIAGONAL = Movement.King[4:]
+
+
+def square(i: int, j: int) -> int:
+  return (j << 3) | i
+
+
+def coords(sq: int) -> Tuple[int, int]:
+  return sq & 7, sq >> 3
+
+
+def iter_squares(bb: int) -> Iterator[int]:
+  """
+  Yields the index of every set bit, lowest first.
+  """
+  while bb:
+    lsb = bb & -bb
+    yield lsb.bit_length() - 1
+    bb ^= lsb
+
+
+def popcount(bb: int) -> int:
+  return bin(bb).count('1')
+
+
+def _target_table(offsets) -> List[List[Tuple[int, int]]]:
+  """
+  For each square, the (i, j) coords of every on-board square one offset away.
+  """
+  table: List[List[Tuple[int, int]]] = []
+  for sq in range(64):
+    i, j = coords(sq)
+    table.append([(i + di, j + dj) for (di, dj) in offsets if 0 <= i + di < 8 and 0 <= j + dj < 8])
+  return table
+
+
+def _ray_target_table(d: Tuple[int, int]) -> List[List[Tuple[int, int]]]:
+  """
+  For each square, the (i, j) coords of the squares along direction d, nearest first.
+  """
+  table: List[List[Tuple[int, int]]] = []
+  for sq in range(64):
+    i, j = coords(sq)
+    targets: List[Tuple[int, int]] = []
+    ni, nj = i + d[0], j + d[1]
+    while 0 <= ni < 8 and 0 <= nj < 8:
+      targets.append((ni, nj))
+      ni, nj = ni + d[0], nj + d[1]
+    table.append(targets)
+  return table
+
+
+def _mask_table(target_table: List[List[Tuple[int, int]]]) -> List[int]:
+  table: List[int] = []
+  for targets in target_table:
+    mask = 0
+    for (ni, nj) in targets:
+      mask |= 1 << square(ni, nj)
+    table.append(mask)
+  return table
+
+
+# Coordinate tables for walking the board[j][i] view without bounds checks, indexed by square.
+KNIGHT_TARGETS = _target_table(Movement.Knight)
+KING_TARGETS = _target_table(Movement.King)
+PAWN_CAPTURE_TARGETS = {
+  'w': _target_table([(-1, -1), (1, -1)]),
+  'b': _target_table([(-1, 1), (1, 1)]),
+}
+RAY_TARGETS: Dict[Tuple[int, int], List[List[Tuple[int, int]]]] = {d: _ray_target_table(d) for d in Movement.King}
+
+KNIGHT_ATTACKS = _mask_table(KNIGHT_TARGETS)
+KING_ATTACKS = _mask_table(KING_TARGETS)
+
+# Squares attacked by a pawn of the given color standing on each square.
+# White pawns move towards j = 0, black pawns towards j = 7.
+PAWN_ATTACKS = {c: _mask_table(PAWN_CAPTURE_TARGETS[c]) for c in 'wb'}
+
+RAYS: Dict[Tuple[int, int], List[int]] = {d: _mask_table(RAY_TARGETS[d]) for d in Movement.King}
+
+# Rays that run towards higher square indices. The first blocker on these is the lowest set bit,
+# on the others it is the highest set bit.
+POSITIVE_RAYS = {d for d in Movement.King if d[1] > 0 or (d[1] == 0 and d[0] > 0)}
+
+
+def ray_attacks(sq: int, occupied: int, d: Tuple[int, int]) -> int:
+  """
+  Squares reachable from sq along d, up to and including the first occupied square.
+  """
+  ray = RAYS[d][sq]
+  blockers = ray & occupied
+  if blockers:
+    if d in POSITIVE_RAYS:
+      blocker = (blockers & -blockers).bit_length() - 1
+    else:
+      blocker = blockers.bit_length() - 1
+    ray ^= RAYS[d][blocker]
+  return ray
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+  attacks = 0
+  for d in ORTHOGONAL:
+    attacks |= ray_attacks(sq, occupied, d)
+  return attacks
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+  attacks = 0
+  for d in DIAGONAL:
+    attacks |= ray_attacks(sq, occupied, d)
+  return attacks
+
+
+def queen_attacks(sq: int, occupied: int) -> int:
+  return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+def attackers_to(bitboards: Dict[str, int], occupied: int, sq: int, c: str) -> int:
+  """
+  Returns the set of pieces of color c that attack sq.
+  """
+  oppo = 'b' if c == 'w' else 'w'
+  straight = bitboards[c + 'R'] | bitboards[c + 'Q']
+  diagonal = bitboards[c + 'B'] | bitboards[c + 'Q']
+
+  attackers = KNIGHT_ATTACKS[sq] & bitboards[c + 'N']
+  attackers |= KING_ATTACKS[sq] & bitboards[c + 'K']
+  # A pawn of color c attacks sq exactly when an opposing pawn on sq would attack it.
+  attackers |= PAWN_ATTACKS[oppo][sq] & bitboards[c + 'P']
+  if straight:
+    attackers |= rook_attacks(sq, occupied) & straight
+  if diagonal:
+    attackers |= bishop_attacks(sq, occupied) & diagonal
+  return attackers
+
+
+def attack_map(bitboards: Dict[str, int], occupied: int, c: str) -> int:
+  """
+  Returns the set of squares attacked by the pieces of color c, whether or not they hold a piece.
+  """
+  attacks = 0
+  for sq in iter_squares(bitboards[c + 'N']):
+    attacks |= KNIGHT_ATTACKS[sq]
+  for sq in iter_squares(bitboards[c + 'K']):
+    attacks |= KING_ATTACKS[sq]
+  pawn_attacks = PAWN_ATTACKS[c]
+  for sq in iter_squares(bitboards[c + 'P']):
+    attacks |= pawn_attacks[sq]
+  for sq in iter_squares(bitboards[c + 'R'] | bitboards[c + 'Q']):
+    attacks |= rook_attacks(sq, occupied)
+  for sq in iter_squares(bitboards[c + 'B'] | bitboards[c + 'Q']):
+    attacks |= bishop_attacks(sq, occupied)
+  return attacks
@@ -1,6 +1,9 @@
+from typing import Dict, List, Optional, Tuple
+
+from bitboard import PIECES, attackers_to, iter_squares, square
 from helpers import glue_notation
 from move import Move, SCORE_PIECE
-from copy import deepcopy
+from zobrist import ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE
 
 EMPTY_BOARD = [
   ['--', '--', '--', '--', '--', '--', '--', '--'],
@@ -24,6 +27,15 @@ START_BOARD = [
   ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
 ]
 
+# Piece letters used by FEN, uppercase for white.
+FEN_PIECES = {letter: ('w' if letter.isupper() else 'b') + letter.upper() for letter in 'PNBRQKpnbrqk'}
+FEN_LETTERS = {piece: letter for letter, piece in FEN_PIECES.items()}
+# Expands the digits of a FEN rank into one '.' per empty square, so each character is then one square.
+FEN_EXPAND = str.maketrans({str(n): '.' * n for n in range(1, 9)})
+FEN_SQUARES = dict(FEN_PIECES, **{'.': '--'})
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'
+
 KNIGHT_SCORES = [[0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0],
                  [0.1, 0.3, 0.5, 0.5, 0.5, 0.5, 0.3, 0.1],
                  [0.2, 0.5, 0.6, 0.65, 0.65, 0.6, 0.5, 0.2],
@@ -81,13 +93,63 @@ PIECE_POSITION_SCORES = {"wN": KNIGHT_SCORES,
                          "bP": PAWN_SCORES[::-1]}
 
 
+def square_score(piece: str, i: int, j: int) -> int:
+  """
+  Contribution of a single piece on (i, j) to score_board, in hundredths of a pawn.
+  """
+  score = SCORE_PIECE[piece[1]] * 100 if piece[0] == 'w' else -SCORE_PIECE[piece[1]] * 100
+  if piece[1] != 'K':
+    score += round(PIECE_POSITION_SCORES[piece][j][i] * 100)
+  return score
+
+
+# Indexed by piece, then by square. Integer hundredths keep the running score exact across make/undo.
+SQUARE_SCORES: Dict[str, List[int]] = {
+  piece: [square_score(piece, sq & 7, sq >> 3) for sq in range(64)] for piece in PIECES
+}
+
+
+class BoardRow(list):
+  """
+  A single row of the board[j][i] view.
+  Writes are forwarded to the owning board so that its bitboards, score and hash never go stale.
+  """
+
+  def __init__(self, owner: 'Board', j: int, squares: List[str]):
+    super().__init__(squares)
+    self.owner = owner
+    self.j = j
+
+  def __setitem__(self, i, piece):
+    previous = list.__getitem__(self, i)
+    list.__setitem__(self, i, piece)
+    self.owner.update_square(i, self.j, previous, piece)
+
+
 class Board:
 
-  def __init__(self, is_test_board: bool = False, console_moves: bool = False):
-    if is_test_board:
-      self.board = deepcopy(EMPTY_BOARD)
+  def __init__(self, is_test_board: bool = False, console_moves: bool = False, debug: bool = False,
+               rows: Optional[List[List[str]]] = None, to_move: str = 'w'):
+    # One bitboard per piece, e.g. 'wN', plus one per color for the occupied squares.
+    self.bitboards: Dict[str, int] = {}
+    self.occupancy: Dict[str, int] = {}
+    self.occupied = 0
+
+    # Running evaluation in hundredths of a pawn, see score_board.
+    self.score = 0
+    # Zobrist key of the position, including the side to move.
+    self.hash = 0
+    # Flipped by every make_move/undo_move, and folded into the hash.
+    self.to_move = to_move
+    # When set, the incremental score and hash are checked against a full recompute.
+    self.debug = debug
+
+    if rows is not None:
+      self.set_board(rows)
+    elif is_test_board:
+      self.set_board(EMPTY_BOARD)
     else:
-      self.board = deepcopy(START_BOARD)
+      self.set_board(START_BOARD)
 
     self.game_log = []
     self.console_moves = console_moves
@@ -100,8 +162,154 @@ class Board:
   def __repr__(self) -> str:
     return '\n' + '\n'.join([' '.join(row) for row in self.board]) + '\n'
 
+  @classmethod
+  def from_fen(cls, fen: str, console_moves: bool = False, debug: bool = False) -> 'Board':
+    """
+    Builds a board from the piece placement and side to move fields of a FEN string.
+    The remaining fields are accepted but ignored, since castling and en passant are not supported.
+    """
+    fields = fen.split()
+    ranks = fields[0].split('/') if fields else []
+    if len(ranks) != 8 or (len(fields) > 1 and fields[1] not in ('w', 'b')):
+      raise ValueError(f"Invalid FEN: {fen}")
+
+    try:
+      rows = [[FEN_SQUARES[char] for char in rank.translate(FEN_EXPAND)] for rank in ranks]
+    except KeyError:
+      raise ValueError(f"Invalid FEN: {fen}")
+    if any(len(row) != 8 for row in rows):
+      raise ValueError(f"Invalid FEN: {fen}")
+
+    board = cls(console_moves=console_moves, debug=debug, rows=rows, to_move=fields[1] if len(fields) > 1 else 'w')
+    for piece in ('wK', 'bK'):
+      bb = board.bitboards[piece]
+      if bb:
+        sq = (bb & -bb).bit_length() - 1
+        if piece == 'wK':
+          board.wk_pos = (sq & 7, sq >> 3)
+        else:
+          board.bk_pos = (sq & 7, sq >> 3)
+    return board
+
+  def to_fen(self) -> str:
+    """
+    FEN string of the position. There are no castling rights, en passant squares or move clocks to record.
+    """
+    ranks: List[str] = []
+    for row in self.board:
+      rank = ''
+      empty = 0
+      for piece in row:
+        if piece == '--':
+          empty += 1
+          continue
+        if empty:
+          rank += str(empty)
+          empty = 0
+        rank += FEN_LETTERS[piece]
+      if empty:
+        rank += str(empty)
+      ranks.append(rank)
+
+    return f"{'/'.join(ranks)} {self.to_move} - - 0 1"
+
   def clear_board(self):
-    self.board = deepcopy(EMPTY_BOARD)
+    self.set_board(EMPTY_BOARD)
+
+  def copy(self) -> 'Board':
+    """
+    Independent copy of the position, for searching it on another thread.
+    """
+    board = Board(is_test_board=True, console_moves=self.console_moves, debug=self.debug)
+    board.to_move = self.to_move
+    board.set_board(self.board)
+    board.wk_pos, board.bk_pos = self.wk_pos, self.bk_pos
+    board.game_log = list(self.game_log)
+    return board
+
+  def set_board(self, rows: List[List[str]]):
+    """
+    Replaces every square with the provided rows and rebuilds the bitboards, score and hash.
+    """
+    self.board: List[BoardRow] = [BoardRow(self, j, row) for j, row in enumerate(rows)]
+
+    # One pass for everything the compute_* methods would each rebuild separately.
+    bitboards = {piece: 0 for piece in PIECES}
+    occupancy = {'w': 0, 'b': 0}
+    score = 0
+    key = ZOBRIST_BLACK_TO_MOVE if self.to_move == 'b' else 0
+    for j, row in enumerate(self.board):
+      for i, piece in enumerate(row):
+        if piece != '--':
+          sq = (j << 3) | i
+          bitboards[piece] |= 1 << sq
+          occupancy[piece[0]] |= 1 << sq
+          score += SQUARE_SCORES[piece][sq]
+          key ^= ZOBRIST_PIECES[piece][sq]
+
+    self.bitboards, self.occupancy = bitboards, occupancy
+    self.occupied = occupancy['w'] | occupancy['b']
+    self.score = score
+    self.hash = key
+
+  def compute_bitboards(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Builds the piece and color bitboards from scratch using the board[j][i] view.
+    """
+    bitboards = {piece: 0 for piece in PIECES}
+    occupancy = {'w': 0, 'b': 0}
+    for j in range(8):
+      for i in range(8):
+        piece = self.board[j][i]
+        if piece != '--':
+          mask = 1 << square(i, j)
+          bitboards[piece] |= mask
+          occupancy[piece[0]] |= mask
+
+    return bitboards, occupancy
+
+  def update_square(self, i: int, j: int, previous: str, piece: str):
+    """
+    Keeps the bitboards, score and hash in sync after (i, j) changed from previous to piece.
+    """
+    sq = square(i, j)
+    mask = 1 << sq
+    if previous != '--':
+      self.bitboards[previous] &= ~mask
+      self.occupancy[previous[0]] &= ~mask
+      self.score -= SQUARE_SCORES[previous][sq]
+      self.hash ^= ZOBRIST_PIECES[previous][sq]
+    if piece != '--':
+      self.bitboards[piece] |= mask
+      self.occupancy[piece[0]] |= mask
+      self.score += SQUARE_SCORES[piece][sq]
+      self.hash ^= ZOBRIST_PIECES[piece][sq]
+    self.occupied = self.occupancy['w'] | self.occupancy['b']
+
+  def compute_hash(self) -> int:
+    """
+    Builds the Zobrist key of the position from scratch.
+    """
+    key = ZOBRIST_BLACK_TO_MOVE if self.to_move == 'b' else 0
+    for j in range(8):
+      for i in range(8):
+        piece = self.board[j][i]
+        if piece != '--':
+          key ^= ZOBRIST_PIECES[piece][square(i, j)]
+
+    return key
+
+  def verify_hash(self):
+    """
+    Raises when the incremental hash has drifted from a full recompute.
+    """
+    expected = self.compute_hash()
+    if self.hash != expected:
+      raise AssertionError(f"Incremental hash {self.hash:x} does not match recomputed hash {expected:x}.\n{self}")
+
+  def toggle_side(self):
+    self.to_move = 'b' if self.to_move == 'w' else 'w'
+    self.hash ^= ZOBRIST_BLACK_TO_MOVE
 
   def make_move(self, move: Move):
     """
@@ -130,6 +338,10 @@ class Board:
       if move.nj == promotion_row:
         self.board[move.nj][move.ni] = p_color + 'Q'
 
+    self.toggle_side()
+    if self.debug:
+      self.verify_hash()
+
   def undo_move(self, move: Move):
     """
     Undo a move from (ni, nj) to (i, j).
@@ -157,21 +369,40 @@ class Board:
       if move.nj == promotion_row and move.promote:
         self.board[move.j][move.i] = p_color + 'P'
 
-  def score_board(self) -> int:
+    self.toggle_side()
+    if self.debug:
+      self.verify_hash()
+
+  def score_board(self) -> float:
     """
     Score the current board, user pieces are scored positively, AI pieces are scored as neg 1.
+    The score is maintained incrementally by every square update, so this is O(1).
+    """
+    if self.debug:
+      self.verify_score()
+    return self.score / 100
+
+  def compute_score(self) -> int:
+    """
+    Scores the board from scratch by walking every square, in hundredths of a pawn.
     """
     score = 0
     for i in range(8):
       for j in range(8):
         piece = self.board[j][i]
         if piece != '--':
-          score += SCORE_PIECE[piece[1]] if piece[0] == 'w' else -SCORE_PIECE[piece[1]]
-          if 'K' not in piece:
-            score += PIECE_POSITION_SCORES[piece][j][i]
+          score += square_score(piece, i, j)
 
     return score
 
+  def verify_score(self):
+    """
+    Raises when the incremental score has drifted from a full recompute.
+    """
+    expected = self.compute_score()
+    if self.score != expected:
+      raise AssertionError(f"Incremental score {self.score} does not match recomputed score {expected}.\n{self}")
+
   @staticmethod
   def to_chess_notation(i, j) -> dict[str, str]:
     files = 'abcdefgh'
@@ -198,7 +429,7 @@ class Board:
 
       notation += destination_pos
     else:
-      notation = piece[1]
+      notation = piece[1] + self.disambiguation(move, piece)
       if move.captured_piece:
         notation += 'x'
       notation += destination_pos
@@ -212,6 +443,26 @@ class Board:
 
     return notation
 
+  def disambiguation(self, move: Move, piece: str) -> str:
+    """
+    The origin file, rank or square needed to tell move apart from the same kind of piece reaching the same square.
+    Must be called after the move is complete, like log_move.
+    """
+    if piece[1] == 'K':
+      return ''
+    # Seen from before the move, so the vacated origin square does not open a line for another piece.
+    occupied = self.occupied | 1 << square(move.i, move.j)
+    others = attackers_to(self.bitboards, occupied, square(move.ni, move.nj), piece[0]) & self.bitboards[piece]
+    if not others:
+      return ''
+
+    origin = self.to_chess_notation(move.i, move.j)
+    if all(sq & 7 != move.i for sq in iter_squares(others)):
+      return origin['file']
+    if all(sq >> 3 != move.j for sq in iter_squares(others)):
+      return origin['rank']
+    return origin['file'] + origin['rank']
+
   def log_game(self):
     move_step = 1
     for i in range(0, len(self.game_log), 2):
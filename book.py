@@ -0,0 +1,148 @@
+"""
+Opening book in a sorted binary file of (position hash, move, weight) records, built from replayed games.
+
+Usage: python3 book.py FILE [FILE ...] [--output book.bin] [--plies N] [--min-count N]
+"""
+import mmap
+import os
+from argparse import ArgumentParser
+from bisect import bisect_left
+from collections import Counter
+from random import choices
+from struct import Struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from board import Board
+from move import Move
+from replay import SanReplayer, read_games
+
+# Big-endian, so records sort the same way as their bytes: Board.hash (64 bits), Move.key (16) and weight (16).
+RECORD = Struct('>QHH')
+MAX_WEIGHT = 0xFFFF
+
+
+class _Keys(Sequence):
+  """
+  The position hashes of a book as a read-only sequence, for bisect.
+  """
+
+  def __init__(self, data, count: int):
+    self.data = data
+    self.count = count
+
+  def __len__(self) -> int:
+    return self.count
+
+  def __getitem__(self, index: int) -> int:
+    return int.from_bytes(self.data[index * RECORD.size:index * RECORD.size + 8], 'big')
+
+
+class OpeningBook:
+  """
+  Read-only view of a book file. The file is memory mapped rather than read, so opening it costs nothing
+  and processes using the same book share it through the page cache.
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self.file = open(path, 'rb')
+    size = os.fstat(self.file.fileno()).st_size
+    if size % RECORD.size:
+      self.file.close()
+      raise ValueError(f"{path} is not a book, its size is not a multiple of {RECORD.size} bytes.")
+    # An empty file cannot be mapped.
+    self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+    self.keys = _Keys(self.data, size // RECORD.size)
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self) -> int:
+    return len(self.keys)
+
+  def close(self):
+    if isinstance(self.data, mmap.mmap):
+      self.data.close()
+    self.file.close()
+
+  def entries(self, key: int) -> List[Tuple[int, int]]:
+    """
+    The (move key, weight) pairs stored for a position, found by binary search.
+    """
+    index = bisect_left(self.keys, key)
+    entries = []
+    while index < len(self.keys):
+      record_key, move_key, weight = RECORD.unpack_from(self.data, index * RECORD.size)
+      if record_key != key:
+        break
+      entries.append((move_key, weight))
+      index += 1
+    return entries
+
+  def choose(self, board: Board, legal_moves: List[Move]) -> Optional[Move]:
+    """
+    Picks one of the book moves for the board at random, in proportion to their weights.
+    Only legal moves are considered, so a hash collision cannot produce an illegal move.
+    """
+    by_key = {move.key: move for move in legal_moves}
+    candidates = [(by_key[move_key], weight) for move_key, weight in self.entries(board.hash)
+                  if move_key in by_key and weight > 0]
+    if not candidates:
+      self.misses += 1
+      return None
+
+    self.hits += 1
+    moves, weights = zip(*candidates)
+    return choices(moves, weights)[0]
+
+
+def count_book_moves(games: Iterable[Tuple[Dict[str, str], List[str]]], plies: int) -> Counter:
+  """
+  How often each move was played from each position, over the first plies moves of every game.
+  A game is used up to its first move that cannot be replayed.
+  """
+  counts: Counter = Counter()
+  for tags, moves in games:
+    replayer = SanReplayer(Board.from_fen(tags['FEN']) if 'FEN' in tags else Board())
+    for token in moves[:plies]:
+      key = replayer.board.hash
+      try:
+        move = replayer.push(token)
+      except ValueError:
+        break
+      counts[key, move.key] += 1
+  return counts
+
+
+def write_book(counts: Counter, path: str, min_count: int = 1) -> int:
+  """
+  Writes the counted moves as a book, sorted by position. Moves played less than min_count times are left out.
+  :returns: The number of records written.
+  """
+  records = sorted((key, move_key, min(count, MAX_WEIGHT)) for (key, move_key), count in counts.items()
+                   if count >= min_count)
+  with open(path, 'wb') as file:
+    for record in records:
+      file.write(RECORD.pack(*record))
+  return len(records)
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('files', nargs='+', help='PGN files or move logs, as read by replay.py.')
+  parser.add_argument('--output', default='book.bin')
+  parser.add_argument('--plies', type=int, default=16, help='How many moves of each game to put in the book.')
+  parser.add_argument('--min-count', type=int, default=1, help='Leave out moves played fewer times than this.')
+  args = parser.parse_args()
+
+  counts: Counter = Counter()
+  for path in args.files:
+    with open(path) as file:
+      counts.update(count_book_moves(read_games(file), args.plies))
+
+  records = write_book(counts, args.output, args.min_count)
+  positions = len({key for key, _ in counts})
+  print(f"Wrote {records} moves from {positions} positions to {args.output}")
+
+
+if __name__ == '__main__':
+  main()
@@ -1,9 +1,28 @@
 from board import Board
-from typing import List, Callable, Tuple, Optional
-from helpers import get_opposite_color, Movement
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Tuple, Optional
+from bitboard import (DIAGONAL, KING_ATTACKS, KING_TARGETS, KNIGHT_ATTACKS, KNIGHT_TARGETS, ORTHOGONAL,
+                      PAWN_CAPTURE_TARGETS, RAY_TARGETS, RAYS, attack_map, iter_squares, ray_attacks, square)
+from helpers import get_opposite_color, parse_coordinate_move, Movement
 from move import Move, MoveBlockVector
 from math import gcd
 
+SLIDER_DIRECTIONS = {'R': ORTHOGONAL, 'B': DIAGONAL, 'Q': ORTHOGONAL + DIAGONAL}
+
+# Positions whose legal moves and game state refresh_moves_and_game_state remembers.
+MOVE_CACHE_SIZE = 256
+
+
+class CachedMoves(NamedTuple):
+  moves: List[Move]
+  # The same moves grouped by origin square (i, j).
+  by_origin: Dict[Tuple[int, int], List[Move]]
+  in_check: bool
+  checks: List[MoveBlockVector]
+  pins: List[MoveBlockVector]
+  checkmate: bool
+  stalemate: bool
+
 
 class Engine:
 
@@ -22,6 +41,9 @@ class Engine:
     self.in_check = False
     self.pins: List[MoveBlockVector] = []
     self.checks: List[MoveBlockVector] = []
+    # Squares the opponent attacks, see get_attacked_squares. Reused until the position or the king moves.
+    self.attacked = 0
+    self.attacked_key: Optional[Tuple[int, str, int]] = None
 
     # Game state
     self.checkmate = False
@@ -32,10 +54,13 @@ class Engine:
     # Reuse them when the game state has not been updated.
     self.white_moves: List[Move] = []
     self.black_moves: List[Move] = []
+    self.moves_by_origin: Dict[str, Dict[Tuple[int, int], List[Move]]] = {'w': {}, 'b': {}}
 
-  @staticmethod
-  def in_bounds(i: int, j: int) -> bool:
-    return 0 <= i < 8 and 0 <= j < 8
+    # Least recently used entries are evicted first, keyed on the position hash, color and king square.
+    self.move_cache: 'OrderedDict[Tuple[int, str, Tuple[int, int]], CachedMoves]' = OrderedDict()
+    self.move_cache_size = MOVE_CACHE_SIZE
+    self.move_cache_hits = 0
+    self.move_cache_misses = 0
 
   @staticmethod
   def infer_direction(move: Move) -> Tuple[int, int]:
@@ -46,16 +71,20 @@ class Engine:
     g = gcd(abs(di), abs(dj))
     return di // g, dj // g
 
-  def return_valid_move(self, i, j, ni, nj) -> Optional[Move]:
-    color = self.board.board[j][i][0]
-    oppo = 'b' if color == 'w' else 'w'
-    new_pos = self.board.board[nj][ni]
-    if new_pos == '--':
-      return Move(i, j, ni, nj, None)
-    elif oppo == new_pos[0]:
-      return Move(i, j, ni, nj, new_pos)
-    else:
-      return None
+  def apply_coordinate_moves(self, moves: List[str], c: str = 'w') -> str:
+    """
+    Plays moves such as 'e2e4' on the board, alternating colors starting with c.
+    :returns: The color to move afterwards.
+    """
+    for text in moves:
+      coords = parse_coordinate_move(text)
+      move = next((m for m in self.generate_valid_moves(c) if (m.i, m.j, m.ni, m.nj) == coords), None)
+      if move is None:
+        raise ValueError(f"Illegal move {text} for {c}.")
+      self.board.make_move(move)
+      c = get_opposite_color(c)
+
+    return c
 
   def check_game_over(self) -> bool:
     return any([self.checkmate, self.stalemate])
@@ -64,13 +93,40 @@ class Engine:
     """
     Used to refresh the white moves given the game state.
     ALso refreshes the game state. A checkmate right after this call indicates a white win.
+    Results are cached, so refreshing an unchanged position again is a lookup.
     """
-    valid_moves = self.generate_valid_moves(c)
+    key = (self.board.hash, c, self.board.wk_pos if c == 'w' else self.board.bk_pos)
+    cached = self.move_cache.get(key)
+    if cached is None:
+      self.move_cache_misses += 1
+      valid_moves = self.generate_valid_moves(c)
+      by_origin: Dict[Tuple[int, int], List[Move]] = {}
+      for move in valid_moves:
+        by_origin.setdefault((move.i, move.j), []).append(move)
+      cached = CachedMoves(valid_moves, by_origin, self.in_check, list(self.checks), list(self.pins), self.checkmate,
+                           self.stalemate)
+      self.move_cache[key] = cached
+      if len(self.move_cache) > self.move_cache_size:
+        self.move_cache.popitem(last=False)
+    else:
+      self.move_cache_hits += 1
+      self.move_cache.move_to_end(key)
+      self.in_check, self.checks, self.pins = cached.in_check, list(cached.checks), list(cached.pins)
+      self.checkmate, self.stalemate = cached.checkmate, cached.stalemate
+      if self.checkmate:
+        self.winner = get_opposite_color(c)
 
     if c == 'w':
-      self.white_moves = valid_moves
+      self.white_moves = cached.moves
     else:
-      self.black_moves = valid_moves
+      self.black_moves = cached.moves
+    self.moves_by_origin[c] = cached.by_origin
+
+  def moves_from(self, i: int, j: int, c: str = 'w') -> List[Move]:
+    """
+    Legal moves of the piece on (i, j), as of the last refresh for color c.
+    """
+    return self.moves_by_origin[c].get((i, j), [])
 
   def find_pin(self, i, j, is_queen: bool) -> Optional[MoveBlockVector]:
     """
@@ -90,73 +146,60 @@ class Engine:
         break
     return pin
 
-  def generate_valid_moves_for_piece(self, i, j, directions, is_queen: bool) -> List[Move]:
+  def generate_valid_moves_for_piece(self, i, j, directions: List[Tuple[int, int]], is_queen: bool) -> List[Move]:
     pin: Optional[MoveBlockVector] = self.find_pin(i, j, is_queen)
 
+    # A pinned slider may only move along the line of the pin, towards the attacker or back towards the king.
+    if pin is not None:
+      reverse = (-pin.d[0], -pin.d[1])
+      directions = [d for d in directions if d == pin.d or d == reverse]
+
     moves: List[Move] = []
     for direction in directions:
       moves.extend(self.generate_moves_in_direction(i, j, direction))
 
-    if pin is None:
-      return moves
-
-    valid_moves: List[Move] = []
-    for move in moves:
-      move_d = self.infer_direction(move)
-
-      if move_d == pin.d or tuple(d * -1 for d in pin.d) == move_d:
-        valid_moves.append(move)
-
-    return valid_moves
+    return moves
 
-  def generate_moves_in_direction(self, i: int, j: int,
-                                  direction: Callable[[int, int], Tuple[int, int]]) -> List[Move]:
+  def generate_moves_in_direction(self, i: int, j: int, direction: Tuple[int, int]) -> List[Move]:
     moves: List[Move] = []
-    ni, nj = direction(i, j)
-    while self.in_bounds(ni, nj):
-      move_maybe = self.return_valid_move(i, j, ni, nj)
-      if move_maybe is not None:
-        moves.append(move_maybe)
-        if move_maybe.captured_piece:
-          break
+    rows = self.board.board
+    color = rows[j][i][0]
+
+    for (ni, nj) in RAY_TARGETS[direction][(j << 3) | i]:
+      target = rows[nj][ni]
+      if target == '--':
+        moves.append(Move(i, j, ni, nj, None))
       else:
+        if target[0] != color:
+          moves.append(Move(i, j, ni, nj, target))
         break
-      ni, nj = direction(ni, nj)
+
     return moves
 
-  def generate_moves_for_direction(self, i, j, d) -> List[Move]:
+  def generate_moves_to_targets(self, i, j, targets: List[Tuple[int, int]]) -> List[Move]:
+    """
+    Builds moves from (i, j) to each of the target squares, skipping squares held by our own pieces.
+    """
     moves: List[Move] = []
+    rows = self.board.board
+    color = rows[j][i][0]
 
-    for (di, dj) in d:
-      ni = i + di
-      nj = j + dj
-      if self.in_bounds(ni, nj):
-        move_maybe = self.return_valid_move(i, j, ni, nj)
-        if move_maybe is not None:
-          moves.append(move_maybe)
+    for (ni, nj) in targets:
+      target = rows[nj][ni]
+      if target == '--':
+        moves.append(Move(i, j, ni, nj, None))
+      elif target[0] != color:
+        moves.append(Move(i, j, ni, nj, target))
 
     return moves
 
   def generate_rook_moves(self, i, j) -> List[Move]:
-    directions = [
-      lambda x, y: (x - 1, y),  # Left
-      lambda x, y: (x + 1, y),  # Right
-      lambda x, y: (x, y - 1),  # Up
-      lambda x, y: (x, y + 1)  # Down
-    ]
     is_queen = self.board.board[j][i][1] == 'Q'
 
-    return self.generate_valid_moves_for_piece(i, j, directions, is_queen)
+    return self.generate_valid_moves_for_piece(i, j, ORTHOGONAL, is_queen)
 
   def generate_bishop_moves(self, i, j) -> List[Move]:
-    directions = [
-      lambda x, y: (x - 1, y - 1),  # Top left
-      lambda x, y: (x + 1, y - 1),  # Top right
-      lambda x, y: (x - 1, y + 1),  # Bottom left
-      lambda x, y: (x + 1, y + 1)  # Bottom right
-    ]
-
-    return self.generate_valid_moves_for_piece(i, j, directions, False)
+    return self.generate_valid_moves_for_piece(i, j, DIAGONAL, False)
 
   def generate_queen_moves(self, i, j) -> List[Move]:
     return self.generate_rook_moves(i, j) + self.generate_bishop_moves(i, j)
@@ -187,14 +230,10 @@ class Engine:
       if j == start_row and self.board.board[nj][i] == '--' and (pin is None or pin.d == (0, direction)):
         moves.append(Move(i, j, i, nj))  # Can't be promoted given starting position.
 
-    for di in [-1, 1]:
-      ni = i + di
-      nj = j + direction
-
-      if self.in_bounds(ni, nj):
-        new_pos = self.board.board[nj][ni]
-        if oppo == new_pos[0] and (pin is None or pin.d == (di, direction)):
-          moves.append(Move(i, j, ni, nj, new_pos, nj == promotion_row))
+    for (ni, nj) in PAWN_CAPTURE_TARGETS[color][(j << 3) | i]:
+      new_pos = self.board.board[nj][ni]
+      if oppo == new_pos[0] and (pin is None or pin.d == (ni - i, direction)):
+        moves.append(Move(i, j, ni, nj, new_pos, nj == promotion_row))
 
     return moves
 
@@ -208,30 +247,32 @@ class Engine:
     if is_pinned:
       return []
     else:
-      return self.generate_moves_for_direction(i, j, Movement.Knight)
+      return self.generate_moves_to_targets(i, j, KNIGHT_TARGETS[(j << 3) | i])
 
   def generate_king_moves(self, i, j) -> List[Move]:
     c = self.board.board[j][i][0]
+    moves = self.generate_moves_to_targets(i, j, KING_TARGETS[(j << 3) | i])
+    # Boxed in kings are common, only build the attack map when there is a square to test.
+    if not moves:
+      return moves
 
-    moves: List[Move] = self.generate_moves_for_direction(i, j, Movement.King)
-    valid_moves: List[Move] = []
-    for move in moves:
-      if c == 'w':
-        self.board.wk_pos = (move.ni, move.nj)
-      else:
-        self.board.bk_pos = (move.ni, move.nj)
-
-      in_check, _, _ = self.get_checks_and_pins(c)
-
-      if not in_check:
-        valid_moves.append(move)
-
-    if c == 'w':
-      self.board.wk_pos = (i, j)
-    else:
-      self.board.bk_pos = (i, j)
+    attacked = self.get_attacked_squares(c)
+    return [move for move in moves if not attacked >> ((move.nj << 3) | move.ni) & 1]
 
-    return valid_moves
+  def get_attacked_squares(self, c: str) -> int:
+    """
+    Returns the set of squares attacked by the opponent of c.
+    Sliders see through c's king, so that the king cannot step back along the line of a check.
+    """
+    k_pos = self.board.wk_pos if c == 'w' else self.board.bk_pos
+    king_sq = square(k_pos[0], k_pos[1])
+    key = (self.board.hash, c, king_sq)
+    if key != self.attacked_key:
+      bitboards = self.board.bitboards
+      occupied = self.board.occupied & ~bitboards[c + 'K'] & ~(1 << king_sq)
+      self.attacked = attack_map(bitboards, occupied, get_opposite_color(c))
+      self.attacked_key = key
+    return self.attacked
 
   def generate_valid_moves(self, c: str) -> List[Move]:
     """
@@ -253,8 +294,7 @@ class Engine:
         if piece_checking[1] == 'N':  # If knight is checking the king, the only valid move is to capture it/run away.
           valid_squares = [(check.i, check.j)]
         else:
-          for i in range(1, 8):
-            valid_square = (k_pos[0] + check.d[0] * i, k_pos[1] + check.d[1] * i)
+          for valid_square in RAY_TARGETS[check.d][square(k_pos[0], k_pos[1])]:
             valid_squares.append(valid_square)
             if valid_square[0] == check.i and valid_square[1] == check.j:
               break
@@ -280,17 +320,82 @@ class Engine:
 
     return moves
 
+  def generate_valid_captures(self, c: str) -> List[Move]:
+    """
+    Returns the valid captures and promotions for a color, the moves a quiescence search looks at.
+    Out of check only squares holding enemy pieces, and the squares pawns promote on, are looked at, so quiet
+    moves are never generated. In check the evasions are generated in full and filtered.
+    """
+    self.in_check, self.checks, self.pins = self.get_checks_and_pins(c)
+    if self.in_check:
+      return [move for move in self.generate_valid_moves(c) if move.captured_piece is not None or move.promote]
+
+    rows = self.board.board
+    enemy = self.board.occupancy[get_opposite_color(c)]
+    occupied = self.board.occupied
+    pins = {(pin.i, pin.j): pin.d for pin in self.pins}
+    moves: List[Move] = []
+
+    for sq in iter_squares(self.board.occupancy[c]):
+      i, j = sq & 7, sq >> 3
+      piece_type = rows[j][i][1]
+      pin = pins.get((i, j))
+      if piece_type == 'P':
+        moves.extend(self.generate_pawn_captures(i, j, c, pin))
+      elif piece_type == 'N':
+        if pin is None:
+          moves.extend(Move(i, j, ni, nj, rows[nj][ni]) for (ni, nj) in KNIGHT_TARGETS[sq]
+                       if enemy >> ((nj << 3) | ni) & 1)
+      elif piece_type == 'K':
+        if KING_ATTACKS[sq] & enemy:
+          attacked = self.get_attacked_squares(c)
+          moves.extend(Move(i, j, ni, nj, rows[nj][ni]) for (ni, nj) in KING_TARGETS[sq]
+                       if (enemy & ~attacked) >> ((nj << 3) | ni) & 1)
+      else:
+        directions = SLIDER_DIRECTIONS[piece_type]
+        if pin is not None:
+          directions = [d for d in directions if d == pin or d == (-pin[0], -pin[1])]
+        for d in directions:
+          # Only the first piece along the ray can be taken.
+          target = ray_attacks(sq, occupied, d) & enemy
+          if target:
+            target_sq = target.bit_length() - 1
+            ni, nj = target_sq & 7, target_sq >> 3
+            moves.append(Move(i, j, ni, nj, rows[nj][ni]))
+
+    return moves
+
+  def generate_pawn_captures(self, i: int, j: int, c: str, pin: Optional[Tuple[int, int]]) -> List[Move]:
+    """
+    Captures and promotions of the pawn on (i, j), which is pinned along pin when that is not None.
+    """
+    moves: List[Move] = []
+    rows = self.board.board
+    direction = -1 if c == 'w' else 1
+    promotion_row = 0 if c == 'w' else 7
+    nj = j + direction
+
+    if nj == promotion_row and rows[nj][i] == '--' and (pin is None or pin == (0, direction)):
+      moves.append(Move(i, j, i, nj, None, True))
+
+    oppo = get_opposite_color(c)
+    for (ni, nj) in PAWN_CAPTURE_TARGETS[c][(j << 3) | i]:
+      target = rows[nj][ni]
+      if target[0] == oppo and (pin is None or pin == (ni - i, direction)):
+        moves.append(Move(i, j, ni, nj, target, nj == promotion_row))
+
+    return moves
+
   def generate_all_moves(self, c: str) -> List[Move]:
     """
     Generates all possible moves without considering checks for a color.
     """
     moves: List[Move] = []
+    rows = self.board.board
 
-    for i in range(8):
-      for j in range(8):
-        piece = self.board.board[j][i]
-        if piece[0] == c:
-          moves.extend(self.move_functions[piece[1]](i, j))
+    for sq in iter_squares(self.board.occupancy[c]):
+      i, j = sq & 7, sq >> 3
+      moves.extend(self.move_functions[rows[j][i][1]](i, j))
 
     return moves
 
@@ -305,52 +410,55 @@ class Engine:
 
     oppo = get_opposite_color(c)
     start_pos = self.board.wk_pos if c == 'w' else self.board.bk_pos
+    start_sq = square(start_pos[0], start_pos[1])
+    rows = self.board.board
+
+    bitboards = self.board.bitboards
+    straight = bitboards[oppo + 'R'] | bitboards[oppo + 'Q']
+    diagonal = bitboards[oppo + 'B'] | bitboards[oppo + 'Q']
+    adjacent = KING_ATTACKS[start_sq] & (bitboards[oppo + 'P'] | bitboards[oppo + 'K'])
 
     for i in range(len(Movement.King)):
       d = Movement.King[i]
+      # Without a matching slider, or a pawn or king next to us, nothing along this ray can check or pin.
+      if not RAYS[d][start_sq] & ((straight if i < 4 else diagonal) | adjacent):
+        continue
       possible_pin = None
-      for mult in range(1, 8):
-        ci = start_pos[0] + (d[0] * mult)
-        cj = start_pos[1] + (d[1] * mult)
-        if self.in_bounds(ci, cj):
-          c_piece = self.board.board[cj][ci]
-          if c_piece[0] == c and c_piece[1] != 'K':
+      for mult, (ci, cj) in enumerate(RAY_TARGETS[d][start_sq], 1):
+        c_piece = rows[cj][ci]
+        if c_piece[0] == c and c_piece[1] != 'K':
+          if possible_pin is None:
+            possible_pin = MoveBlockVector(ci, cj, d)
+          else:
+            break
+        elif c_piece[0] == oppo:
+          enemy_piece_type = c_piece[1]
+          enemy_piece_color = c_piece[0]
+          is_rook_check = (0 <= i <= 3 and enemy_piece_type == 'R')
+          is_bishop_check = (4 <= i <= 7 and enemy_piece_type == 'B')
+          is_pawn_check = (mult == 1 and enemy_piece_type == 'P' and (
+            (enemy_piece_color == 'w' and 6 <= i <= 7) or (enemy_piece_color == 'b' and 4 <= i <= 5)
+          ))
+          is_queen_check = enemy_piece_type == 'Q'
+          is_king_check = (enemy_piece_type == 'K' and mult == 1)
+
+          if any([is_rook_check, is_queen_check, is_bishop_check, is_pawn_check, is_king_check]):
             if possible_pin is None:
-              possible_pin = MoveBlockVector(ci, cj, d)
-            else:
+              in_check = True
+              checks.append(MoveBlockVector(ci, cj, d))
+              # No need to check further from this direction.
               break
-          elif c_piece[0] == oppo:
-            enemy_piece_type = c_piece[1]
-            enemy_piece_color = c_piece[0]
-            is_rook_check = (0 <= i <= 3 and enemy_piece_type == 'R')
-            is_bishop_check = (4 <= i <= 7 and enemy_piece_type == 'B')
-            is_pawn_check = (mult == 1 and enemy_piece_type == 'P' and (
-              (enemy_piece_color == 'w' and 6 <= i <= 7) or (enemy_piece_color == 'b' and 4 <= i <= 5)
-            ))
-            is_queen_check = enemy_piece_type == 'Q'
-            is_king_check = (enemy_piece_type == 'K' and mult == 1)
-
-            if any([is_rook_check, is_queen_check, is_bishop_check, is_pawn_check, is_king_check]):
-              if possible_pin is None:
-                in_check = True
-                checks.append(MoveBlockVector(ci, cj, d))
-                # No need to check further from this direction.
-                break
-              else:
-                pins.append(possible_pin)
-                break
-            # Enemy is not applying checks.
             else:
+              pins.append(possible_pin)
               break
-        else:
-          break
-
-    for move in Movement.Knight:
-      ci, cj = start_pos[0] + move[0], start_pos[1] + move[1]
-      if self.in_bounds(ci, cj):
-        c_piece = self.board.board[cj][ci]
-        if c_piece[0] == oppo and c_piece[1] == 'N':
-          in_check = True
-          checks.append(MoveBlockVector(ci, cj, move))
+          # Enemy is not applying checks.
+          else:
+            break
+
+    knights = KNIGHT_ATTACKS[start_sq] & self.board.bitboards[oppo + 'N']
+    for sq in iter_squares(knights):
+      ci, cj = sq & 7, sq >> 3
+      in_check = True
+      checks.append(MoveBlockVector(ci, cj, (ci - start_pos[0], cj - start_pos[1])))
 
     return in_check, checks, pins
@@ -1,10 +1,10 @@
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import pygame  # type: ignore
+from bitboard import KING_TARGETS, square
 from board import Board
 from engine import Engine
 from helpers import truncate
-from move import Move
 
 DISPLAY_HEIGHT = 400
 DISPLAY_WIDTH = 400
@@ -20,40 +20,22 @@ GRAY_LIGHT = (240, 240, 240)
 GRAY_DARK = (200, 200, 200)
 BROWN = (160, 82, 45)
 
-bB = pygame.image.load("assets/bB.png")
-bK = pygame.image.load("assets/bK.png")
-bN = pygame.image.load("assets/bN.png")
-bP = pygame.image.load("assets/bP.png")
-bQ = pygame.image.load("assets/bQ.png")
-bR = pygame.image.load("assets/bR.png")
-
-wB = pygame.image.load("assets/wB.png")
-wK = pygame.image.load("assets/wK.png")
-wN = pygame.image.load("assets/wN.png")
-wP = pygame.image.load("assets/wP.png")
-wQ = pygame.image.load("assets/wQ.png")
-wR = pygame.image.load("assets/wR.png")
-
-image_dict = {
-  "bB": bB,
-  "bK": bK,
-  "bN": bN,
-  "bP": bP,
-  "bQ": bQ,
-  "bR": bR,
-  "wB": wB,
-  "wK": wK,
-  "wN": wN,
-  "wP": wP,
-  "wQ": wQ,
-  "wR": wR
-}
+SPRITE_NAMES = [c + p for c in 'bw' for p in 'BKNPQR']
+
+# A highlighted square's color, and whether it shows the small circle that marks a quiet move.
+Highlight = Tuple[Tuple[int, int, int], bool]
 
 
 class Gui:
 
   def __init__(self):
     self.game_display = pygame.display.set_mode((DISPLAY_WIDTH, DISPLAY_HEIGHT))
+    # Converted to the display's pixel format once, rather than on every blit.
+    self.sprites = {name: pygame.image.load(f"assets/{name}.png").convert_alpha() for name in SPRITE_NAMES}
+    # What each square showed in the last frame, None when it has to be repainted.
+    self.drawn: Dict[Tuple[int, int], Optional[Tuple[str, Optional[Highlight]]]] = {
+      (i, j): None for i in range(8) for j in range(8)
+    }
     self.last_selected: Optional[tuple[int, int]] = None
     self.exit: bool = False
 
@@ -82,21 +64,13 @@ class Gui:
       return False
     # Potentially capturing another piece.
     elif self.last_selected is not None:
-      for potential_move in engine.white_moves:
-        if potential_move == Move(self.last_selected[0], self.last_selected[1], i, j):
+      for potential_move in engine.moves_from(self.last_selected[0], self.last_selected[1]):
+        if potential_move.ni == i and potential_move.nj == j:
           return True
       # An invalid move was selected.
       self.last_selected = None
       return False
 
-  def draw_board(self):
-    self.game_display.fill(GRAY_DARK)
-    for i in range(4):
-      for j in range(4):
-        ci, cj = i * 100, j * 100
-        self.draw_square(ci, cj, WHITE)
-        self.draw_square(ci + SQUARE_SIDE, cj + SQUARE_SIDE, WHITE)
-
   def draw_square(self, i, j, color):
     pygame.draw.rect(self.game_display, color,
                      pygame.Rect(i, j, SQUARE_SIDE, SQUARE_SIDE))
@@ -104,39 +78,83 @@ class Gui:
   def draw_circle(self, i, j, color, radius=5):
     pygame.draw.circle(self.game_display, color, (i, j), radius)
 
-  def draw_pieces(self, board: Board):
-    for i in range(8):
-      for j in range(8):
-        if board.board[j][i] != "--":
-          self.game_display.blit(image_dict[board.board[j][i]], ((i * 50) - 5, (j * 50) - 5))
+  def draw_cell(self, board: Board, i: int, j: int, highlight: Optional[Highlight]) -> pygame.Rect:
+    """
+    Repaints a single square and returns its rect.
+    Sprites hang 5px over the squares around them, so the neighbours' pieces are drawn into it as well.
+    """
+    rect = pygame.Rect(i * SQUARE_SIDE, j * SQUARE_SIDE, SQUARE_SIDE, SQUARE_SIDE)
+    self.game_display.set_clip(rect)
+
+    color, marker = highlight if highlight is not None else (WHITE if (i + j) % 2 == 0 else GRAY_DARK, False)
+    self.draw_square(rect.x, rect.y, color)
+    if marker:
+      self.draw_circle(rect.x + 25, rect.y + 25, BLUE_LIGHT)
+
+    for (ni, nj) in [(i, j)] + KING_TARGETS[square(i, j)]:
+      piece = board.board[nj][ni]
+      if piece != "--":
+        self.game_display.blit(self.sprites[piece], ((ni * 50) - 5, (nj * 50) - 5))
+
+    self.game_display.set_clip(None)
+    return rect
 
-  def highlight_moves(self, engine: Engine):
+  def highlight_moves(self, engine: Engine, highlights: Dict[Tuple[int, int], Highlight]):
     if self.last_selected is not None:
       i, j = self.last_selected
       if engine.board.board[j][i] == '--':
         return
-      self.draw_square(i * 50, j * 50, BLUE_LIGHT)
-
-      for move in engine.white_moves:
-        if move.i == i and move.j == j:
-          if move.captured_piece is None:
-            ci, cj = move.ni * 50 + 25, move.nj * 50 + 25
-            self.draw_circle(ci, cj, BLUE_LIGHT)
-          else:
-            ci, cj = move.ni * 50, move.nj * 50
-            self.draw_square(ci, cj, BLUE_DARK)
-
-  def highlight_white_check(self, engine: Engine):
+      highlights[(i, j)] = (BLUE_LIGHT, False)
+
+      for move in engine.moves_from(i, j):
+        if move.captured_piece is None:
+          base = WHITE if (move.ni + move.nj) % 2 == 0 else GRAY_DARK
+          highlights[(move.ni, move.nj)] = (base, True)
+        else:
+          highlights[(move.ni, move.nj)] = (BLUE_DARK, False)
+
+  def highlight_white_check(self, engine: Engine, highlights: Dict[Tuple[int, int], Highlight]):
     # Do this to warn about a potential white check.
     engine.refresh_moves_and_game_state('w')
     if engine.in_check:
-      i, j = engine.board.wk_pos
-      self.draw_square(i * 50, j * 50, RED_CHECK)
+      highlights[engine.board.wk_pos] = (RED_CHECK, False)
+
+  def draw_progress(self, fraction: float):
+    """
+    Draws a thin bar along the bottom edge to show how far the AI search has got.
+    """
+    bar = pygame.Rect(0, DISPLAY_HEIGHT - 4, DISPLAY_WIDTH, 4)
+    pygame.draw.rect(self.game_display, GRAY_DARK, bar)
+    pygame.draw.rect(self.game_display, BROWN, pygame.Rect(0, DISPLAY_HEIGHT - 4, int(DISPLAY_WIDTH * fraction), 4))
+    pygame.display.update(bar)
+    # The bar covers the bottom edge of the last rank, which has to be repainted once it is gone.
+    for i in range(8):
+      self.drawn[(i, 7)] = None
 
   def update_game_state(self, engine: Engine, skip_white_check: bool = False):
-    self.draw_board()
-    self.highlight_moves(engine)
+    """
+    Repaints the squares that look different from the last frame, and pushes only those to the screen.
+    """
+    highlights: Dict[Tuple[int, int], Highlight] = {}
+    self.highlight_moves(engine, highlights)
     if not skip_white_check:
-      self.highlight_white_check(engine)
-    self.draw_pieces(engine.board)
-    pygame.display.update()
+      self.highlight_white_check(engine, highlights)
+
+    rows = engine.board.board
+    dirty_squares = set()
+    for (i, j), drawn in self.drawn.items():
+      state = (rows[j][i], highlights.get((i, j)))
+      if drawn != state:
+        dirty_squares.add((i, j))
+        # A piece that came or went also touched the edges of the squares around it.
+        if drawn is not None and drawn[0] != state[0]:
+          dirty_squares.update(KING_TARGETS[square(i, j)])
+
+    dirty: List[pygame.Rect] = []
+    for (i, j) in dirty_squares:
+      highlight = highlights.get((i, j))
+      self.drawn[(i, j)] = (rows[j][i], highlight)
+      dirty.append(self.draw_cell(engine.board, i, j, highlight))
+
+    if dirty:
+      pygame.display.update(dirty)
@@ -1,5 +1,5 @@
 import math
-from typing import List
+from typing import List, Tuple
 from move import Move
 
 
@@ -31,3 +31,28 @@ def get_opposite_color(color: str) -> str:
 
 def glue_notation(n) -> str:
   return n['file'] + n['rank']
+
+
+def parse_square(text: str) -> Tuple[int, int]:
+  """
+  Converts a square such as 'e4' into (i, j) coords.
+  """
+  return 'abcdefgh'.index(text[0]), '87654321'.index(text[1])
+
+
+def format_coordinate_move(move: Move) -> str:
+  """
+  Converts a move into coordinate notation such as 'e2e4', promotions get a trailing 'q'.
+  """
+  files, ranks = 'abcdefgh', '87654321'
+  text = files[move.i] + ranks[move.j] + files[move.ni] + ranks[move.nj]
+  return text + 'q' if move.promote else text
+
+
+def parse_coordinate_move(text: str) -> Tuple[int, int, int, int]:
+  """
+  Converts a move such as 'e2e4' into (i, j, ni, nj) coords.
+  """
+  i, j = parse_square(text[0:2])
+  ni, nj = parse_square(text[2:4])
+  return i, j, ni, nj
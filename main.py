@@ -1,4 +1,4 @@
-from os import environ
+from os import environ, path
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 
 import pygame  # type: ignore
@@ -6,8 +6,12 @@ import pygame  # type: ignore
 from engine import Engine
 from gui import Gui
 from board import Board
-from ai import Ai
+from parallel import ParallelAi
 from move import Move
+from worker import SearchWorker, AI_MOVE_EVENT
+
+# Written by book.py.
+BOOK_PATH = 'book.bin'
 
 if __name__ == '__main__':
   pygame.init()
@@ -17,10 +21,18 @@ if __name__ == '__main__':
   board = Board()
   engine = Engine(board)
   gui = Gui()
-  # Recommend 3 for smooth instant move generation. TODO: Need to thread this somehow.
-  ai = Ai(depth=4)
+  # Searches as deep as it can (up to depth 6) within two seconds per move, on a background thread.
+  # Deeper iterations are spread over one process per core. Openings come from the book if one was built.
+  ai = ParallelAi(depth=6, time_limit=2, book_path=BOOK_PATH if path.exists(BOOK_PATH) else None)
+  worker = SearchWorker(ai)
+  clock = pygame.time.Clock()
+
+  # Set from white's move until the AI's reply has been played. The worker thread can finish before a click
+  # queued during the search is handled, so whether it is still running does not tell.
+  awaiting_reply = False
 
-  def process_move(move: Move):
+  def process_move(move: Move) -> bool:
+    global awaiting_reply
     board.make_move(move)
     # Since white went, we can assume that it would not put the king in check.
     gui.update_game_state(engine, skip_white_check=True)
@@ -30,10 +42,9 @@ if __name__ == '__main__':
 
     if engine.check_game_over():
       return False
-    ai.make_optimal_move(engine)
-
-    gui.update_game_state(engine)
-    return not engine.check_game_over()
+    awaiting_reply = True
+    worker.start(engine)
+    return True
 
   running = True
 
@@ -43,7 +54,15 @@ if __name__ == '__main__':
       if event.type == pygame.QUIT:
         running = False
         gui.exit = True
-      elif event.type == pygame.MOUSEBUTTONDOWN:
+        worker.cancel()
+      elif event.type == AI_MOVE_EVENT:
+        awaiting_reply = False
+        engine.refresh_moves_and_game_state('b')
+        game_over = ai.play_move(engine, event.move)
+        gui.update_game_state(engine)
+        running = not game_over
+      # White has to wait for the AI to reply before moving again.
+      elif event.type == pygame.MOUSEBUTTONDOWN and not awaiting_reply:
         if event.button == 1:  # Left mouse button.
           engine.refresh_moves_and_game_state('w')
 
@@ -58,10 +77,15 @@ if __name__ == '__main__':
             current_move = Move(pi, pj, i, j)
             running = process_move(current_move)
 
+    if worker.busy:
+      gui.draw_progress(worker.progress())
+    clock.tick(30)
+
   while not gui.exit:
     for event in pygame.event.get():
       gui.exit = True
 
+  ai.close()
   board.log_game()
 
   pygame.quit()
@@ -11,10 +11,23 @@ SCORE_PIECE = {
 
 
 class Move:
+  # The search allocates moves by the thousand, slots keep them small and skip the per-object dict.
+  __slots__ = ('i', 'j', 'ni', 'nj', 'captured_piece', 'promote', 'key')
 
   def __init__(self, i, j, ni, nj, captured_piece=None, promote=False) -> None:
-    self.i, self.j, self.ni, self.nj, self.captured_piece, self.promote = \
-      i, j, ni, nj, captured_piece, promote
+    self.i = i
+    self.j = j
+    self.ni = ni
+    self.nj = nj
+    self.captured_piece = captured_piece
+    self.promote = promote
+    # From-square in the low six bits, to-square in the next six, squares indexed as j * 8 + i.
+    # Without under promotion, this identifies a move within a position.
+    self.key = (j << 3 | i) | (nj << 3 | ni) << 6
+
+  @classmethod
+  def from_key(cls, key: int, captured_piece=None, promote=False) -> 'Move':
+    return cls(key & 7, (key >> 3) & 7, (key >> 6) & 7, (key >> 9) & 7, captured_piece, promote)
 
   def __repr__(self) -> str:
     return f"({self.i}, {self.j}) -> ({self.ni}, {self.nj}) captured_piece={self.captured_piece} promote={self.promote}"
@@ -23,8 +36,10 @@ class Move:
     if not isinstance(other, Move):
       return NotImplemented
     # TODO: Should this include more than the positional fields?
-    return (self.i, self.j, self.ni, self.nj) == \
-      (other.i, other.j, other.ni, other.nj)
+    return self.key == other.key
+
+  def __hash__(self) -> int:
+    return self.key
 
   # TODO: Write chess notation logs.
 
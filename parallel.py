@@ -0,0 +1,276 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Event as ProcessEvent, Value
+from os import cpu_count
+from random import shuffle
+from threading import Event
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from move import Move
+from stats import SearchStats
+from transposition import EXACT, SharedTranspositionTable
+
+# Set up once per pool process by _init_worker, and reused by every root move it searches.
+_worker_ai: Optional[Ai] = None
+_shared_alpha = None
+_stop_event = None
+
+
+def search_root_move(ai: Ai, engine: Engine, move: Move, depth: int, alpha: float) -> float:
+  """
+  Score of a single root move for the AI, searched with the window (alpha, 10000).
+  A score at or below alpha only means the move is no better than alpha.
+  """
+  engine.board.make_move(move)
+  score = -ai.find_alpha_beta_prune_move(None, engine, depth - 1, -10000, -alpha, -ai.turn_multiplier, ply=1)
+  engine.board.undo_move(move)
+  return score
+
+
+def _init_worker(settings: Dict, shared_alpha, stop_event):
+  global _worker_ai, _shared_alpha, _stop_event
+  _worker_ai = Ai(**settings)
+  _worker_ai.shared_alpha = shared_alpha
+  _shared_alpha = shared_alpha
+  _stop_event = stop_event
+
+
+def _search_root_move_worker(board: Board, move_key: int, depth: int,
+                             time_left: Optional[float]) -> Tuple[float, bool, List[Move], SearchStats, bool]:
+  """
+  Searches one root move in a pool process. The board arrives as a pickled copy, the move as its key.
+  :returns: The score, whether it raised the shared alpha, the line starting with the move, the stats of the
+    search and whether it was stopped.
+  """
+  ai = _worker_ai
+  ai.reset_search(_stop_event)
+  ai.root_depth = depth
+  if time_left is not None:
+    ai.deadline = perf_counter() + time_left
+
+  engine = Engine(board)
+  move = next(m for m in engine.generate_valid_moves(ai.color) if m.key == move_key)
+  score = search_root_move(ai, engine, move, depth, _shared_alpha.value)
+
+  improved = False
+  if not ai.stopped:
+    with _shared_alpha.get_lock():
+      if score > _shared_alpha.value:
+        _shared_alpha.value = score
+        improved = True
+  ai.finish_search()
+  return score, improved, [move] + ai.pv_table[1], ai.stats, ai.stopped
+
+
+def _init_helper(settings: Dict, table_name: str, tt_size_mb: float, stop_event):
+  global _worker_ai, _stop_event
+  _worker_ai = Ai(tt_size_mb=0, **settings)
+  _worker_ai.transposition_table = SharedTranspositionTable(tt_size_mb, name=table_name)
+  _stop_event = stop_event
+
+
+def _helper_search(board: Board, first_depth: int, max_depth: int, time_left: Optional[float]) -> Tuple[int, int]:
+  """
+  Runs iterative deepening in a Lazy SMP helper process, starting at first_depth. Only the entries it leaves
+  in the shared transposition table matter, the moves it finds are thrown away.
+  :returns: The node counts.
+  """
+  ai = _worker_ai
+  ai.reset_search(_stop_event)
+  if time_left is not None:
+    ai.deadline = perf_counter() + time_left
+  ai.orderer.new_search()
+
+  engine = Engine(board)
+  engine.refresh_moves_and_game_state(ai.color)
+  # Every helper walks the root moves in its own order, which spreads them over different parts of the tree.
+  root_moves = list(ai.own_moves(engine))
+  shuffle(root_moves)
+
+  for depth in range(first_depth, max_depth + 1):
+    if _stop_event.is_set():
+      break
+    ai.root_depth = depth
+    ai.next_move = None
+    ai.search_root(root_moves, engine, depth, -10000, 10000)
+    if ai.stopped:
+      break
+    ai.previous_best_move = ai.next_move
+    ai.principal_variation = ai.pv_table[0]
+
+  return ai.nodes, ai.quiescence_nodes
+
+
+class ParallelAi(Ai):
+  """
+  Spreads each iteration over a pool of processes, young brothers wait style: the first root move is searched
+  here to get a score to beat, then the remaining root moves are searched in parallel.
+  Whenever a worker finds a better root move it raises the shared alpha, and the other workers narrow their
+  windows to it. Processes rather than threads, since the GIL would serialize the search anyway.
+  The pool is created on first use and kept between moves, call close() when done with it.
+  """
+
+  def __init__(self, depth=3, workers: Optional[int] = None, parallel_depth: int = 3, tt_size_mb: float = 16,
+               quiescence_depth: int = 6, **kwargs):
+    super().__init__(depth, tt_size_mb=tt_size_mb, quiescence_depth=quiescence_depth, **kwargs)
+    self.workers = workers if workers is not None else cpu_count() or 1
+    # Shallower iterations are searched here, they finish before the pool could help.
+    self.parallel_depth = parallel_depth
+    # Each worker keeps its own transposition table between the root moves it is given.
+    self.worker_settings = dict(self.search_settings, tt_size_mb=tt_size_mb, quiescence_depth=quiescence_depth,
+                                color=self.color)
+
+    self.executor: Optional[ProcessPoolExecutor] = None
+    self.root_alpha = Value('d', -10000.0)
+    self.worker_stop = ProcessEvent()
+
+  def pool(self) -> ProcessPoolExecutor:
+    if self.executor is None:
+      self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                          initargs=(self.worker_settings, self.root_alpha, self.worker_stop))
+    return self.executor
+
+  def close(self):
+    if self.executor is not None:
+      self.worker_stop.set()
+      self.executor.shutdown()
+      self.executor = None
+
+  def in_parallel(self, root_moves: List[Move], depth: int) -> bool:
+    return depth >= self.parallel_depth and self.workers >= 2 and len(root_moves) >= 2
+
+  def search_aspiration(self, root_moves: List[Move], engine: Engine, depth: int,
+                        previous_score: Optional[float]) -> float:
+    """
+    Iterations split over the pool always search the full window, so they are never searched twice.
+    """
+    if self.in_parallel(root_moves, depth):
+      return self.search_root(root_moves, engine, depth, -10000, 10000)
+    return super().search_aspiration(root_moves, engine, depth, previous_score)
+
+  def search_root(self, root_moves: List[Move], engine: Engine, depth: int, alpha: float, beta: float) -> float:
+    """
+    Deep enough iterations are split over the pool, and ignore the window: the eldest brother is searched with
+    the full window and the others with the shared alpha.
+    """
+    if not self.in_parallel(root_moves, depth):
+      return super().search_root(root_moves, engine, depth, alpha, beta)
+
+    board = engine.board
+    self.nodes += 1
+    hash_move = self.previous_best_move
+    if self.transposition_table is not None:
+      entry = self.transposition_table.probe(board.hash)
+      if entry is not None and entry.move is not None:
+        hash_move = entry.move
+    moves = self.orderer.order(root_moves, board, 0, hash_move)
+
+    # The eldest brother gets a full window, the others only have to beat it.
+    best_move = moves[0]
+    best_score = search_root_move(self, engine, best_move, depth, -10000)
+    if self.stopped:
+      return 0
+    best_line = [best_move] + self.pv_table[1]
+
+    self.root_alpha.value = best_score
+    self.worker_stop.clear()
+    time_left = self.deadline - perf_counter() if self.deadline is not None else None
+    position = board.copy()
+    executor = self.pool()
+    pending = {executor.submit(_search_root_move_worker, position, move.key, depth, time_left): move
+               for move in moves[1:]}
+    futures = dict(pending)
+
+    while pending:
+      done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+      if self.stop_event is not None and self.stop_event.is_set():
+        self.worker_stop.set()
+        self.stopped = True
+
+      for future in done:
+        score, improved, line, stats, stopped = future.result()
+        self.nodes += stats.nodes
+        self.quiescence_nodes += stats.quiescence_nodes
+        self.stats.add_counters(stats)
+        self.stopped = self.stopped or stopped
+        # Only a score that raised the shared alpha is exact, the rest are upper bounds.
+        if improved and score > best_score:
+          best_score = score
+          best_move = futures[future]
+          best_line = line
+
+    if self.stopped:
+      return 0
+    self.next_move = best_move
+    self.pv_table[0] = best_line
+    if self.transposition_table is not None:
+      self.transposition_table.store(board.hash, depth, best_score, EXACT, best_move)
+    return best_score
+
+
+class LazySmpAi(Ai):
+  """
+  Lazy SMP: helper processes run the same iterative deepening search as this one, all sharing one
+  transposition table in shared memory, and are stopped as soon as this search finishes.
+  The helpers do not report moves, they only fill the table with results this search then gets for free.
+  Every other helper starts one iteration deeper, so that they are not all working on the same depth.
+  The pool and the table are kept between moves, call close() when done with them.
+  """
+
+  def __init__(self, depth=3, workers: Optional[int] = None, tt_size_mb: float = 16, quiescence_depth: int = 6,
+               **kwargs):
+    super().__init__(depth, tt_size_mb=0, quiescence_depth=quiescence_depth, **kwargs)
+    # Including this process, so workers - 1 helpers.
+    self.workers = workers if workers is not None else cpu_count() or 1
+    self.tt_size_mb = tt_size_mb
+    self.worker_settings = dict(self.search_settings, quiescence_depth=quiescence_depth, color=self.color)
+    self.transposition_table = SharedTranspositionTable(tt_size_mb)
+
+    self.executor: Optional[ProcessPoolExecutor] = None
+    self.worker_stop = ProcessEvent()
+    # Nodes searched by the helpers during the last search, on top of self.nodes.
+    self.helper_nodes = 0
+
+  def pool(self) -> ProcessPoolExecutor:
+    if self.executor is None:
+      self.executor = ProcessPoolExecutor(
+        max_workers=self.workers - 1, initializer=_init_helper,
+        initargs=(self.worker_settings, self.transposition_table.name, self.tt_size_mb, self.worker_stop))
+    return self.executor
+
+  def close(self):
+    if self.executor is not None:
+      self.worker_stop.set()
+      self.executor.shutdown()
+      self.executor = None
+    if self.transposition_table is not None:
+      self.transposition_table.close()
+      self.transposition_table = None
+
+  def find_optimal_move(self, engine: Engine, stop_event: Optional[Event] = None) -> Optional[Move]:
+    self.helper_nodes = 0
+    return super().find_optimal_move(engine, stop_event)
+
+  def iterative_deepening(self, engine: Engine) -> Optional[Move]:
+    """
+    Runs the helpers alongside the search. Only called out of book, so a book move never starts them.
+    """
+    if self.workers < 2:
+      return super().iterative_deepening(engine)
+
+    self.worker_stop.clear()
+    position = engine.board.copy()
+    executor = self.pool()
+    helpers = [executor.submit(_helper_search, position, 1 + helper % 2, self.depth, self.time_limit)
+               for helper in range(1, self.workers)]
+
+    try:
+      move = super().iterative_deepening(engine)
+    finally:
+      self.worker_stop.set()
+      for helper in helpers:
+        self.helper_nodes += helper.result()[0]
+    return move
@@ -0,0 +1,132 @@
+"""
+Counts the leaf nodes of the legal move tree to a fixed depth, to check and time the move generator.
+
+Usage: python3 perft.py DEPTH [--fen FEN] [--moves "e2e4 e7e5"] [--divide] [--workers N] [--check]
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from board import Board, START_FEN
+from engine import Engine
+from helpers import format_coordinate_move, get_opposite_color
+
+# Known counts from the start position. This generator has no castling, en passant or under promotion,
+# none of which can occur before depth 5, so only these depths are comparable with the published numbers.
+START_POSITION_COUNTS = {
+  1: 20,
+  2: 400,
+  3: 8902,
+  4: 197281,
+}
+
+
+def perft(engine: Engine, c: str, depth: int) -> int:
+  """
+  Number of leaf nodes of the legal move tree, depth plies deep.
+  """
+  if depth == 0:
+    return 1
+
+  moves = engine.generate_valid_moves(c)
+  # Bulk counting, no need to make the last ply of moves.
+  if depth == 1:
+    return len(moves)
+
+  nodes = 0
+  oppo = get_opposite_color(c)
+  for move in moves:
+    engine.board.make_move(move)
+    nodes += perft(engine, oppo, depth - 1)
+    engine.board.undo_move(move)
+
+  return nodes
+
+
+def divide(engine: Engine, c: str, depth: int) -> Dict[str, int]:
+  """
+  Leaf counts below each root move, keyed by the move in coordinate notation.
+  """
+  counts: Dict[str, int] = {}
+  for move in engine.generate_valid_moves(c):
+    engine.board.make_move(move)
+    counts[format_coordinate_move(move)] = perft(engine, get_opposite_color(c), depth - 1)
+    engine.board.undo_move(move)
+
+  return counts
+
+
+def setup_position(moves: List[str], fen: str = START_FEN) -> Tuple[Engine, str]:
+  board = Board.from_fen(fen)
+  engine = Engine(board)
+  c = engine.apply_coordinate_moves(moves, board.to_move)
+  return engine, c
+
+
+def _divide_worker(moves: List[str], depth: int, fen: str) -> int:
+  """
+  Counts the subtree below the last move of moves in a worker process with a board of its own.
+  """
+  engine, c = setup_position(moves, fen)
+  return perft(engine, c, depth)
+
+
+def parallel_divide(moves: List[str], depth: int, workers: Optional[int] = None,
+                    fen: str = START_FEN) -> Dict[str, int]:
+  """
+  Same as divide, with the root moves split across a process pool.
+  """
+  engine, c = setup_position(moves, fen)
+  root_moves = [format_coordinate_move(move) for move in engine.generate_valid_moves(c)]
+
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    futures = {text: executor.submit(_divide_worker, moves + [text], depth - 1, fen) for text in root_moves}
+    return {text: future.result() for text, future in futures.items()}
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('depth', type=int)
+  parser.add_argument('--fen', default=START_FEN, help='Position to count from, the start position by default.')
+  parser.add_argument('--moves', default='', help='Moves in coordinate notation played from the position.')
+  parser.add_argument('--divide', action='store_true', help='Print the leaf count below each root move.')
+  parser.add_argument('--workers', type=int, default=0, help='Split the root moves across this many processes.')
+  parser.add_argument('--check', action='store_true', help='Compare with the known start position counts.')
+  args = parser.parse_args()
+
+  moves = args.moves.split()
+  start = perf_counter()
+  if args.depth > 1 and args.workers > 0:
+    counts = parallel_divide(moves, args.depth, args.workers, args.fen)
+  elif args.depth > 0 and args.divide:
+    engine, c = setup_position(moves, args.fen)
+    counts = divide(engine, c, args.depth)
+  else:
+    engine, c = setup_position(moves, args.fen)
+    counts = {'': perft(engine, c, args.depth)}
+  elapsed = perf_counter() - start
+  nodes = sum(counts.values())
+
+  if args.divide:
+    for text in sorted(counts):
+      print(f"{text}: {counts[text]}")
+    print()
+
+  print(f"Nodes: {nodes}")
+  print(f"Time: {elapsed:.3f}s")
+  print(f"NPS: {nodes / elapsed if elapsed > 0 else 0:.0f}")
+
+  if args.check:
+    expected = START_POSITION_COUNTS.get(args.depth)
+    if moves or args.fen != START_FEN or expected is None:
+      print("No known count for this position and depth.")
+    elif nodes != expected:
+      print(f"MISMATCH: expected {expected}")
+      raise SystemExit(1)
+    else:
+      print("OK")
+
+
+if __name__ == '__main__':
+  main()
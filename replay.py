@@ -0,0 +1,233 @@
+"""
+Replays games written in SAN, such as Board.game_log or the movetext of PGN files, onto a Board.
+
+Usage: python3 replay.py FILE [--fen]
+"""
+import re
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bitboard import (KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, attackers_to, bishop_attacks, coords,
+                      iter_squares, queen_attacks, rook_attacks, square)
+from board import Board
+from engine import Engine
+from helpers import get_opposite_color, parse_square
+from move import Move
+
+# Piece, origin file, origin rank, capture, destination, promotion, then optional check and annotation marks.
+SAN_PATTERN = re.compile(r'([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*')
+
+RESULTS = {'1-0', '0-1', '1/2-1/2', '*'}
+# Move numbers such as '12.' or '12...', sometimes glued to the move that follows, or bare as Board.log_game
+# prints them.
+MOVE_NUMBER = re.compile(r'\d+\.+')
+
+
+class SanReplayer:
+  """
+  Plays SAN moves one at a time onto a board.
+  Rather than generating every legal move, each token is resolved through the attack tables keyed by its
+  destination square and piece type, which gives the few pieces that could have made it. Only those are
+  checked for legality, by making the move and looking for attackers on the king.
+  """
+
+  def __init__(self, board: Optional[Board] = None, log: bool = False):
+    self.board = board if board is not None else Board()
+    self.engine = Engine(self.board)
+    self.c = self.board.to_move
+    # Whether to write every move to board.game_log as well, which costs a game state refresh per move.
+    self.log = log
+
+  def origins(self, destination: int, piece_type: str, capture: bool) -> int:
+    """
+    Squares holding a piece of the side to play, of the given type, that could move to destination.
+    :param capture: Whether the move is written as a capture, which decides how a pawn moves.
+    """
+    board = self.board
+    c, oppo = self.c, get_opposite_color(self.c)
+    bb = board.bitboards[c + piece_type]
+    target = 1 << destination
+    if board.occupancy[c] & target:
+      return 0
+
+    if piece_type == 'P':
+      if capture:
+        return PAWN_ATTACKS[oppo][destination] & bb if board.occupancy[oppo] & target else 0
+      if board.occupied & target:
+        return 0
+      # White pawns move towards lower square indices.
+      step = 8 if c == 'w' else -8
+      behind = destination + step
+      if not 0 <= behind < 64:
+        return 0
+      if bb >> behind & 1:
+        return 1 << behind
+      start_rank = 6 if c == 'w' else 1
+      if not board.occupied >> behind & 1 and 0 <= behind + step < 64 and (behind + step) >> 3 == start_rank:
+        return bb & 1 << (behind + step)
+      return 0
+    if piece_type == 'N':
+      return KNIGHT_ATTACKS[destination] & bb
+    if piece_type == 'K':
+      return KING_ATTACKS[destination] & bb
+    if piece_type == 'B':
+      return bishop_attacks(destination, board.occupied) & bb
+    if piece_type == 'R':
+      return rook_attacks(destination, board.occupied) & bb
+    return queen_attacks(destination, board.occupied) & bb
+
+  def is_legal(self, move: Move) -> bool:
+    """
+    Whether move leaves the mover's king safe.
+    """
+    board = self.board
+    board.make_move(move)
+    king = board.wk_pos if self.c == 'w' else board.bk_pos
+    attacked = attackers_to(board.bitboards, board.occupied, square(king[0], king[1]), get_opposite_color(self.c))
+    board.undo_move(move)
+    return not attacked
+
+  def resolve(self, token: str) -> Move:
+    """
+    Finds the legal move that a SAN token such as 'Nbd7', 'exd5' or 'e8=Q+' stands for.
+    """
+    if token.startswith('O-O') or token.startswith('0-0'):
+      raise ValueError(f"Castling is not supported: {token}.")
+    match = SAN_PATTERN.fullmatch(token)
+    if match is None:
+      raise ValueError(f"Not a SAN move: {token}.")
+    piece, from_file, from_rank, capture, destination, promotion = match.groups()
+    if promotion is not None and promotion != 'Q':
+      raise ValueError(f"Under promotion is not supported: {token}.")
+
+    ni, nj = parse_square(destination)
+    piece_type = piece or 'P'
+    captured = self.board.board[nj][ni]
+    candidates: List[Move] = []
+    for sq in iter_squares(self.origins(square(ni, nj), piece_type, capture is not None)):
+      i, j = coords(sq)
+      if from_file is not None and i != 'abcdefgh'.index(from_file):
+        continue
+      if from_rank is not None and j != '87654321'.index(from_rank):
+        continue
+      move = Move(i, j, ni, nj, captured if captured != '--' else None, piece_type == 'P' and nj in (0, 7))
+      if self.is_legal(move):
+        candidates.append(move)
+
+    if not candidates:
+      raise ValueError(f"Illegal move {token} for {self.c}.")
+    if len(candidates) > 1:
+      raise ValueError(f"Ambiguous move {token} for {self.c}.")
+    return candidates[0]
+
+  def push(self, token: str) -> Move:
+    move = self.resolve(token)
+    self.board.make_move(move)
+    self.c = get_opposite_color(self.c)
+    if self.log:
+      self.engine.refresh_moves_and_game_state(self.c)
+      self.board.log_move(move, self.engine.in_check, self.engine.checkmate)
+    return move
+
+  def replay(self, tokens: Iterable[str]) -> Iterator[Move]:
+    """
+    Plays the tokens in order, yielding each move once it is on the board.
+    """
+    for token in tokens:
+      yield self.push(token)
+
+
+def tokenize(text: str) -> Iterator[str]:
+  """
+  Yields the SAN moves of PGN movetext, skipping move numbers, comments, variations, NAGs and results.
+  """
+  depth = 0
+  for word in re.sub(r'\{[^}]*\}|;[^\n]*', ' ', text).replace('(', ' ( ').replace(')', ' ) ').split():
+    if word == '(':
+      depth += 1
+    elif word == ')':
+      depth -= 1
+    elif depth == 0 and word not in RESULTS and not word.startswith('$'):
+      # Board.log_game prints move numbers without the dot, and castling may be written with zeros.
+      if word.isdigit():
+        continue
+      number = MOVE_NUMBER.match(word)
+      if number is not None:
+        word = word[number.end():]
+      if word:
+        yield word
+
+
+def read_games(lines: Iterable[str]) -> Iterator[Tuple[Dict[str, str], List[str]]]:
+  """
+  Splits a PGN-like stream into games, one at a time, as (tags, SAN moves).
+  A game ends at its result token, at a blank line after its moves, or where the tags of the next game begin.
+  So plain move lists without tags or results are read one game per paragraph.
+  """
+  tags: Dict[str, str] = {}
+  moves: List[str] = []
+  for line in lines:
+    line = line.strip()
+    if not line:
+      if moves:
+        yield tags, moves
+        tags, moves = {}, []
+      continue
+    if line.startswith('['):
+      if moves:
+        yield tags, moves
+        tags, moves = {}, []
+      name, _, value = line[1:-1].partition(' ')
+      tags[name] = value.strip('"')
+      continue
+
+    moves.extend(tokenize(line))
+    if line.split() and line.split()[-1] in RESULTS:
+      yield tags, moves
+      tags, moves = {}, []
+
+  if moves:
+    yield tags, moves
+
+
+def replay_game(moves: Iterable[str], fen: Optional[str] = None) -> Board:
+  """
+  Plays a whole game from the start position, or from fen, and returns the final board.
+  """
+  replayer = SanReplayer(Board.from_fen(fen) if fen else Board())
+  for _ in replayer.replay(moves):
+    pass
+  return replayer.board
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('file')
+  parser.add_argument('--fen', action='store_true', help='Print the final position of every game.')
+  args = parser.parse_args()
+
+  games = plies = failures = 0
+  start = perf_counter()
+  with open(args.file) as file:
+    for tags, moves in read_games(file):
+      games += 1
+      try:
+        board = replay_game(moves, tags.get('FEN'))
+      except ValueError as error:
+        failures += 1
+        print(f"Game {games}: {error}")
+        continue
+      plies += len(moves)
+      if args.fen:
+        print(board.to_fen())
+  elapsed = perf_counter() - start
+
+  print(f"Games: {games} ({failures} failed)")
+  print(f"Moves: {plies}")
+  print(f"Time: {elapsed:.3f}s")
+  print(f"Games/s: {games / elapsed if elapsed > 0 else 0:.0f}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,238 @@
+"""
+Plays a match between two AI configurations without the GUI, and reports the result and the search speed.
+
+Usage: python3 selfplay.py --games N --a depth=3 --b depth=2,quiescence_depth=0 [--workers N] [--max-moves N]
+                           [--openings FILE] [--stats FILE]
+"""
+from argparse import ArgumentParser
+from ast import literal_eval
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import inf, log10, sqrt
+from random import choice, seed
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ai import Ai
+from bitboard import popcount
+from board import Board
+from engine import Engine
+from helpers import get_opposite_color
+from stats import SearchStats
+
+# Start positions, as moves in coordinate notation from the start position or as FEN strings.
+# Each one is played twice, with the colors swapped.
+OPENINGS = [
+  '',
+  'e2e4 e7e5',
+  'e2e4 c7c5',
+  'e2e4 e7e6',
+  'e2e4 c7c6',
+  'd2d4 d7d5',
+  'd2d4 g8f6 c2c4 e7e6',
+  'c2c4 e7e5',
+  'g1f3 d7d5',
+  'e2e4 e7e5 g1f3 b8c6 f1c4',
+  'e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3',
+  'd2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5',
+]
+
+
+class MoveStats(NamedTuple):
+  player: str
+  ply: int
+  stats: SearchStats
+
+
+class GameResult(NamedTuple):
+  # From the first configuration's point of view: 1 for a win, 0.5 for a draw and 0 for a loss.
+  score: float
+  reason: str
+  # Color the first configuration played, 'w' or 'b'.
+  a_color: str
+  plies: int
+  # Per configuration, keyed 'a' and 'b'.
+  nodes: Dict[str, int]
+  search_time: Dict[str, float]
+  move_times: Dict[str, List[float]]
+  # The search stats of every move.
+  search_stats: List[MoveStats]
+
+
+def parse_settings(text: str) -> Dict:
+  """
+  Turns 'depth=3,time_limit=0.5' into keyword arguments for Ai.
+  """
+  settings = {}
+  for item in filter(None, text.split(',')):
+    name, _, value = item.partition('=')
+    if not value:
+      raise ValueError(f"Expected name=value, got {item}.")
+    settings[name.strip()] = literal_eval(value.strip())
+  return settings
+
+
+def play_game(opening: str, settings_a: Dict, settings_b: Dict, a_plays_white: bool, max_plies: int,
+              game_seed: int) -> GameResult:
+  seed(game_seed)
+  if '/' in opening:
+    engine = Engine(Board.from_fen(opening))
+    c = engine.board.to_move
+  else:
+    engine = Engine(Board())
+    c = engine.apply_coordinate_moves(opening.split())
+
+  colors = {'a': 'w' if a_plays_white else 'b', 'b': 'b' if a_plays_white else 'w'}
+  players = {name: Ai(color=colors[name], **settings) for name, settings in (('a', settings_a), ('b', settings_b))}
+  to_play = {color: name for name, color in colors.items()}
+
+  nodes = {'a': 0, 'b': 0}
+  search_time = {'a': 0.0, 'b': 0.0}
+  move_times: Dict[str, List[float]] = {'a': [], 'b': []}
+  search_stats: List[MoveStats] = []
+  seen = Counter([engine.board.hash])
+  plies = 0
+
+  while True:
+    engine.refresh_moves_and_game_state(c)
+    if engine.checkmate:
+      score, reason = (0.0 if to_play[c] == 'a' else 1.0), 'checkmate'
+      break
+    if engine.stalemate:
+      score, reason = 0.5, 'stalemate'
+      break
+    if seen[engine.board.hash] >= 3:
+      score, reason = 0.5, 'repetition'
+      break
+    if popcount(engine.board.occupied) == 2:
+      score, reason = 0.5, 'insufficient material'
+      break
+    if plies >= max_plies:
+      score, reason = 0.5, 'move limit'
+      break
+
+    name = to_play[c]
+    ai = players[name]
+    start = perf_counter()
+    move = ai.find_optimal_move(engine)
+    elapsed = perf_counter() - start
+    if move is None:
+      move = choice(ai.own_moves(engine))
+
+    nodes[name] += ai.nodes
+    search_time[name] += elapsed
+    move_times[name].append(elapsed)
+    search_stats.append(MoveStats(name, plies, ai.stats))
+
+    engine.board.make_move(move)
+    c = get_opposite_color(c)
+    seen[engine.board.hash] += 1
+    plies += 1
+
+  return GameResult(score, reason, colors['a'], plies, nodes, search_time, move_times, search_stats)
+
+
+def elo_difference(score: float) -> float:
+  """
+  Elo difference that makes the expected score equal to score, infinite for a clean sweep either way.
+  """
+  if score <= 0:
+    return -inf
+  if score >= 1:
+    return inf
+  return -400 * log10(1 / score - 1)
+
+
+def match_elo(scores: List[float]) -> Tuple[float, float, float]:
+  """
+  Elo difference of the first configuration, with the bounds of its 95% confidence interval.
+  The interval comes from the standard error of the per-game scores.
+  """
+  mean = sum(scores) / len(scores)
+  deviation = sqrt(sum((score - mean) ** 2 for score in scores) / len(scores))
+  margin = 1.96 * deviation / sqrt(len(scores))
+  return elo_difference(mean), elo_difference(mean - margin), elo_difference(mean + margin)
+
+
+def percentile(values: List[float], p: float) -> float:
+  """
+  Nearest-rank percentile, p between 0 and 100.
+  """
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  rank = max(1, -(-len(ordered) * p // 100))
+  return ordered[int(rank) - 1]
+
+
+def _play_game_args(args: Tuple) -> GameResult:
+  return play_game(*args)
+
+
+def run_match(settings_a: Dict, settings_b: Dict, games: int, workers: int = 1, max_plies: int = 200,
+              base_seed: int = 0, openings: Optional[List[str]] = None) -> List[GameResult]:
+  openings = openings or OPENINGS
+  schedule = [(openings[(index // 2) % len(openings)], settings_a, settings_b, index % 2 == 0, max_plies,
+               base_seed + index) for index in range(games)]
+  if workers > 1:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      return list(executor.map(_play_game_args, schedule))
+  return [play_game(*args) for args in schedule]
+
+
+def format_elo(value: float) -> str:
+  return f"{value:+.0f}" if abs(value) != inf else ('+inf' if value > 0 else '-inf')
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--a', default='depth=3', help='Settings of the first AI, e.g. depth=3,time_limit=0.5.')
+  parser.add_argument('--b', default='depth=2', help='Settings of the second AI.')
+  parser.add_argument('--games', type=int, default=len(OPENINGS) * 2)
+  parser.add_argument('--workers', type=int, default=1, help='Play this many games at once in separate processes.')
+  parser.add_argument('--max-moves', type=int, default=100, help='Moves per side before a game is called a draw.')
+  parser.add_argument('--openings', help='File with one opening per line, as FEN or coordinate moves.')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--stats', help='Write the search stats of every move to this file, as JSON lines.')
+  args = parser.parse_args()
+
+  openings = None
+  if args.openings:
+    with open(args.openings) as file:
+      openings = [line.strip() for line in file if line.strip() and not line.startswith('#')]
+
+  settings_a, settings_b = parse_settings(args.a), parse_settings(args.b)
+  start = perf_counter()
+  results = run_match(settings_a, settings_b, args.games, args.workers, args.max_moves * 2, args.seed, openings)
+  elapsed = perf_counter() - start
+
+  if args.stats:
+    with open(args.stats, 'w') as file:
+      for game, result in enumerate(results):
+        for move in result.search_stats:
+          file.write(move.stats.to_json(game=game, player=move.player, ply=move.ply) + '\n')
+
+  scores = [result.score for result in results]
+  wins, draws = scores.count(1.0), scores.count(0.5)
+  losses = len(scores) - wins - draws
+  elo, low, high = match_elo(scores)
+
+  print(f"A: {args.a}")
+  print(f"B: {args.b}")
+  print(f"Games: {len(results)} in {elapsed:.1f}s")
+  print(f"A wins / draws / losses: {wins} / {draws} / {losses} ({sum(scores) / len(scores):.1%})")
+  print(f"Elo difference: {format_elo(elo)} (95% CI {format_elo(low)} to {format_elo(high)})")
+  for reason, count in Counter(result.reason for result in results).most_common():
+    print(f"  {reason}: {count}")
+
+  for name in 'ab':
+    nodes = sum(result.nodes[name] for result in results)
+    search_time = sum(result.search_time[name] for result in results)
+    move_times = [time for result in results for time in result.move_times[name]]
+    print(f"{name.upper()}: {nodes / search_time if search_time > 0 else 0:.0f} nodes/s, move time "
+          f"p50 {percentile(move_times, 50):.3f}s p90 {percentile(move_times, 90):.3f}s "
+          f"p99 {percentile(move_times, 99):.3f}s")
+
+
+if __name__ == '__main__':
+  main()
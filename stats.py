@@ -0,0 +1,110 @@
+import json
+from typing import Dict, List, NamedTuple
+
+
+# Counters that searches in other processes add to those of the search they help.
+COUNTERS = ('beta_cutoffs', 'first_move_cutoffs', 'null_move_cutoffs', 'lmr_reductions', 'lmr_researches',
+            'pvs_researches', 'tt_probes', 'tt_hits', 'bitbase_hits', 'movegen_time', 'eval_time')
+
+
+class IterationStats(NamedTuple):
+  depth: int
+  # Nodes and seconds spent on this iteration alone.
+  nodes: int
+  time: float
+  # Nodes of this iteration over those of the one before, zero for the first.
+  branching_factor: float
+
+
+class SearchStats:
+  """
+  What one call to Ai.find_optimal_move did, for tuning and for spotting regressions.
+  Cutoffs are counted in the main search, not the quiescence search.
+  Time spent generating moves and evaluating is only measured when the AI is created with profile=True,
+  since timing every call slows the search down.
+  ParallelAi adds in the counters of its workers. LazySmpAi only reports its own search, its helpers are
+  counted in helper_nodes.
+  """
+
+  def __init__(self):
+    self.depth = 0
+    self.nodes = 0
+    self.quiescence_nodes = 0
+    self.time = 0.0
+    self.beta_cutoffs = 0
+    # Cutoffs caused by the first move searched, a measure of how good the move ordering is.
+    self.first_move_cutoffs = 0
+    # Nodes cut off by a null move, and late moves searched shallower and how many of those needed a full search.
+    self.null_move_cutoffs = 0
+    self.lmr_reductions = 0
+    self.lmr_researches = 0
+    # Moves after the first that beat alpha and had to be searched again with the full window, and iterations
+    # searched again because their score fell outside the aspiration window.
+    self.pvs_researches = 0
+    self.aspiration_researches = 0
+    # Best line of the deepest completed iteration, in coordinate notation.
+    self.pv: List[str] = []
+    self.tt_probes = 0
+    self.tt_hits = 0
+    self.bitbase_hits = 0
+    self.book_move = False
+    self.movegen_time = 0.0
+    self.eval_time = 0.0
+    self.iterations: List[IterationStats] = []
+
+  @property
+  def nodes_per_second(self) -> float:
+    return self.nodes / self.time if self.time > 0 else 0.0
+
+  @property
+  def first_move_cutoff_rate(self) -> float:
+    return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+  @property
+  def tt_hit_rate(self) -> float:
+    return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+  def add_counters(self, other: 'SearchStats'):
+    """
+    Adds the cutoff, table and timing counters of a search done in another process, such as a root move
+    searched by a ParallelAi worker. Nodes are counted by the AI itself, so they are left to it.
+    """
+    for name in COUNTERS:
+      setattr(self, name, getattr(self, name) + getattr(other, name))
+
+  def add_iteration(self, depth: int, nodes: int, time: float):
+    previous = self.iterations[-1].nodes if self.iterations else 0
+    self.iterations.append(IterationStats(depth, nodes, time, nodes / previous if previous else 0.0))
+
+  def to_dict(self) -> Dict:
+    return {
+      'depth': self.depth,
+      'nodes': self.nodes,
+      'quiescence_nodes': self.quiescence_nodes,
+      'time': round(self.time, 6),
+      'nps': round(self.nodes_per_second),
+      'beta_cutoffs': self.beta_cutoffs,
+      'first_move_cutoffs': self.first_move_cutoffs,
+      'first_move_cutoff_rate': round(self.first_move_cutoff_rate, 4),
+      'null_move_cutoffs': self.null_move_cutoffs,
+      'lmr_reductions': self.lmr_reductions,
+      'lmr_researches': self.lmr_researches,
+      'pvs_researches': self.pvs_researches,
+      'aspiration_researches': self.aspiration_researches,
+      'pv': self.pv,
+      'tt_probes': self.tt_probes,
+      'tt_hits': self.tt_hits,
+      'tt_hit_rate': round(self.tt_hit_rate, 4),
+      'bitbase_hits': self.bitbase_hits,
+      'book_move': self.book_move,
+      'movegen_time': round(self.movegen_time, 6),
+      'eval_time': round(self.eval_time, 6),
+      'iterations': [{'depth': iteration.depth, 'nodes': iteration.nodes, 'time': round(iteration.time, 6),
+                      'branching_factor': round(iteration.branching_factor, 3)} for iteration in self.iterations],
+    }
+
+  def to_json(self, **extra) -> str:
+    """
+    The stats as a single line of JSON, with any extra fields (game, move number and so on) in front.
+    """
+    return json.dumps(dict(extra, **self.to_dict()))
@@ -0,0 +1,206 @@
+import sys
+import os
+import unittest
+from random import seed
+from threading import Event, Thread
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from helpers import format_coordinate_move, get_opposite_color
+from move import Move
+
+
+class TestAiSearch(unittest.TestCase):
+  def setUp(self):
+    seed(0)
+    self.board = Board()
+    self.engine = Engine(self.board)
+    self.board.make_move(Move(4, 6, 4, 4))
+    self.engine.refresh_moves_and_game_state('b')
+
+  def assertBoardIntact(self):
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+    self.assertEqual(self.board.score, self.board.compute_score())
+    self.assertEqual(self.board.board[4][4], 'wP')
+    self.assertEqual(self.board.bitboards, self.board.compute_bitboards()[0])
+
+  def test_completes_every_iteration(self):
+    ai = Ai(depth=3)
+    move = ai.find_optimal_move(self.engine)
+    self.assertIn(move, self.engine.black_moves)
+    self.assertEqual(ai.completed_depth, 3)
+    self.assertBoardIntact()
+
+  def test_node_limit(self):
+    ai = Ai(depth=10, node_limit=3000)
+    move = ai.find_optimal_move(self.engine)
+    self.assertIn(move, self.engine.black_moves)
+    self.assertLess(ai.completed_depth, 10)
+    # The limit is checked periodically, so the search may overshoot slightly.
+    self.assertLess(ai.nodes, 3000 + 512)
+    self.assertBoardIntact()
+
+  def test_time_limit(self):
+    ai = Ai(depth=10, time_limit=0.2)
+    move = ai.find_optimal_move(self.engine)
+    self.assertIn(move, self.engine.black_moves)
+    self.assertGreaterEqual(ai.completed_depth, 1)
+    self.assertLess(ai.completed_depth, 10)
+    self.assertBoardIntact()
+
+  def test_finds_mate_in_one(self):
+    self.board.clear_board()
+    self.board.board[0][7] = 'bK'
+    self.board.board[7][0] = 'wK'
+    self.board.board[6][7] = 'bR'
+    self.board.board[1][2] = 'bR'
+    # Gives white a spare move, so that cutting off the king is not stalemate.
+    self.board.board[4][4] = 'wP'
+    self.board.bk_pos = (7, 0)
+    self.board.wk_pos = (0, 7)
+    self.engine.refresh_moves_and_game_state('b')
+
+    # Mates are not scored by distance, so keep the search too shallow to see slower mates.
+    ai = Ai(depth=2)
+    self.assertEqual(ai.find_optimal_move(self.engine), Move(2, 1, 2, 7))
+
+  def test_plays_white(self):
+    self.board.clear_board()
+    self.board.board[7][7] = 'wK'
+    self.board.board[0][0] = 'bK'
+    self.board.board[1][7] = 'wR'
+    self.board.board[6][5] = 'wR'
+    self.board.board[3][3] = 'bP'
+    self.board.wk_pos = (7, 7)
+    self.board.bk_pos = (0, 0)
+    self.engine.refresh_moves_and_game_state('w')
+
+    ai = Ai(depth=2, color='w')
+    # The board still has black to move after 1.e4, the search flips it only while it runs.
+    self.assertEqual(ai.find_optimal_move(self.engine), Move(5, 6, 5, 0))
+    self.assertEqual(self.board.to_move, 'b')
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+
+  def test_stop_event_cancels_search(self):
+    stop_event = Event()
+    stop_event.set()
+    ai = Ai(depth=6)
+    # Cancellation is honoured even during the first iteration.
+    self.assertIsNone(ai.find_optimal_move(self.engine, stop_event))
+    self.assertEqual(ai.completed_depth, 0)
+    self.assertBoardIntact()
+
+  def test_search_on_board_copy(self):
+    ai = Ai(depth=10)
+    stop_event = Event()
+    search_engine = Engine(self.board.copy())
+    search_engine.refresh_moves_and_game_state('b')
+
+    thread = Thread(target=ai.find_optimal_move, args=(search_engine, stop_event))
+    thread.start()
+    stop_event.set()
+    thread.join(timeout=5)
+    self.assertFalse(thread.is_alive())
+    self.assertBoardIntact()
+
+  def setup_defended_pawn(self):
+    self.board.clear_board()
+    self.board.board[0][7] = 'bK'
+    self.board.board[7][0] = 'wK'
+    self.board.board[3][3] = 'bQ'
+    self.board.board[4][4] = 'wP'
+    self.board.board[5][3] = 'wP'
+    self.board.bk_pos = (7, 0)
+    self.board.wk_pos = (0, 7)
+    self.engine.refresh_moves_and_game_state('b')
+
+  def test_horizon_without_quiescence(self):
+    self.setup_defended_pawn()
+    ai = Ai(depth=1, quiescence_depth=0)
+    self.assertEqual(ai.find_optimal_move(self.engine), Move(3, 3, 4, 4))
+    self.assertEqual(ai.quiescence_nodes, 0)
+
+  def test_quiescence_avoids_defended_pawn(self):
+    self.setup_defended_pawn()
+    ai = Ai(depth=1)
+    self.assertNotEqual(ai.find_optimal_move(self.engine), Move(3, 3, 4, 4))
+    self.assertGreater(ai.quiescence_nodes, 0)
+    self.assertBoardIntact()
+
+  def test_selective_search_visits_fewer_nodes(self):
+    full_width = Ai(depth=4, null_move=False, lmr=False)
+    full_width.find_optimal_move(self.engine)
+    self.assertEqual(full_width.stats.null_move_cutoffs + full_width.stats.lmr_reductions, 0)
+
+    seed(0)
+    selective = Ai(depth=4)
+    self.assertIn(selective.find_optimal_move(self.engine), self.engine.black_moves)
+    self.assertLess(selective.nodes, full_width.nodes)
+    self.assertGreater(selective.stats.lmr_reductions, 0)
+    self.assertLessEqual(selective.stats.lmr_researches, selective.stats.lmr_reductions)
+
+    # Null moves need a few plies to spare.
+    deeper = Ai(depth=5)
+    deeper.find_optimal_move(self.engine)
+    self.assertGreater(deeper.stats.null_move_cutoffs, 0)
+    self.assertEqual(self.board.to_move, 'b')
+    self.assertBoardIntact()
+
+  def test_no_null_move_with_only_pawns(self):
+    board = Board.from_fen('4k3/pppp4/8/8/8/8/PPPP4/4K3 b - - 0 1')
+    engine = Engine(board)
+    engine.refresh_moves_and_game_state('b')
+    ai = Ai(depth=4)
+    ai.find_optimal_move(engine)
+    self.assertEqual(ai.stats.null_move_cutoffs, 0)
+    self.assertIsNone(ai.null_move_search(engine, 4, -10000, -1, 1))
+
+  def test_principal_variation(self):
+    ai = Ai(depth=4)
+    move, line, stats = ai.search(self.engine)
+    self.assertEqual(line[0], move)
+    self.assertLessEqual(len(line), 4)
+    self.assertEqual(stats.pv[0], format_coordinate_move(move))
+
+    # Every move of the line is legal in turn.
+    c = 'b'
+    for pv_move in line:
+      self.assertIn(pv_move, self.engine.generate_valid_moves(c))
+      self.board.make_move(pv_move)
+      c = get_opposite_color(c)
+    for pv_move in reversed(line):
+      self.board.undo_move(pv_move)
+    self.assertBoardIntact()
+
+  def root_score(self, ai: Ai) -> float:
+    seed(0)
+    ai.find_optimal_move(self.engine)
+    return ai.transposition_table.probe(self.board.hash).score
+
+  def test_aspiration_windows_keep_the_score(self):
+    full_window = self.root_score(Ai(depth=4, null_move=False, lmr=False, aspiration_window=0))
+    # So narrow that most iterations fail at least once.
+    narrow = Ai(depth=4, null_move=False, lmr=False, aspiration_window=0.01)
+    self.assertEqual(self.root_score(narrow), full_window)
+    self.assertGreater(narrow.stats.aspiration_researches, 0)
+    self.assertBoardIntact()
+
+  def test_plays_on_when_every_move_is_mated(self):
+    self.board = Board.from_fen('k7/2K4p/7P/8/8/8/8/1R6 b - - 0 1')
+    self.engine = Engine(self.board)
+    self.engine.refresh_moves_and_game_state('b')
+    for settings in ({}, {'null_move': False, 'lmr': False, 'aspiration_window': 0}):
+      ai = Ai(depth=3, **settings)
+      move, line, stats = ai.search(self.engine)
+      self.assertIn(move, self.engine.black_moves)
+      self.assertEqual(line, [move])
+      self.assertEqual(stats.pv, [format_coordinate_move(move)])
+
+
+if __name__ == '__main__':
+  unittest.main()
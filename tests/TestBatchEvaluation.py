@@ -0,0 +1,43 @@
+import sys
+import os
+import unittest
+from random import seed
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from batch import encode_planes, encode_squares, evaluate, np, random_positions
+from board import Board
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class TestBatchEvaluation(unittest.TestCase):
+  def setUp(self):
+    seed(0)
+    self.boards = random_positions(200)
+
+  def test_encoders(self):
+    board = Board()
+    planes = encode_planes([board])
+    self.assertEqual(planes.shape, (1, 12, 64))
+    self.assertEqual(int(planes.sum()), 32)
+    squares = encode_squares([board])
+    self.assertEqual(squares.shape, (1, 64))
+    self.assertEqual(int((squares != 0).sum()), 32)
+    # a8 holds a black rook and e1 the white king, see bitboard.PIECES for the codes.
+    self.assertEqual(squares[0, 0], 10)
+    self.assertEqual(squares[0, 60], 6)
+
+  def test_matches_score_board(self):
+    expected = [board.score_board() for board in self.boards]
+    self.assertEqual(evaluate(encode_planes(self.boards)).tolist(), expected)
+    self.assertEqual(evaluate(encode_squares(self.boards)).tolist(), expected)
+
+  def test_rejects_other_shapes(self):
+    with self.assertRaises(ValueError):
+      evaluate(np.zeros((2, 8, 8, 12)))
+
+
+if __name__ == '__main__':
+  unittest.main()
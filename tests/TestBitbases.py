@@ -0,0 +1,119 @@
+import sys
+import os
+import unittest
+from random import randrange, seed
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from bitbase import Bitbases, WIN_SCORE
+from bitboard import KING_ATTACKS, attackers_to, coords
+from board import Board
+from engine import Engine
+from helpers import get_opposite_color
+
+
+class TestBitbases(unittest.TestCase):
+  def setUp(self):
+    seed(0)
+    self.bitbases = Bitbases()
+
+  def probe(self, fen: str) -> int:
+    board = Board.from_fen(fen)
+    return self.bitbases.probe(board, board.to_move)
+
+  def random_position(self, piece: str) -> Board:
+    """
+    A legal position with white or black as the stronger side, and either side to move.
+    """
+    while True:
+      strong_king, weak_king, piece_square = randrange(64), randrange(64), randrange(64)
+      if len({strong_king, weak_king, piece_square}) < 3 or KING_ATTACKS[strong_king] >> weak_king & 1:
+        continue
+      if piece == 'P' and piece_square >> 3 in (0, 7):
+        continue
+
+      strong = 'wb'[randrange(2)]
+      weak = get_opposite_color(strong)
+      board = Board(is_test_board=True)
+      board.clear_board()
+      board.board[strong_king >> 3][strong_king & 7] = strong + 'K'
+      board.board[weak_king >> 3][weak_king & 7] = weak + 'K'
+      board.board[piece_square >> 3][piece_square & 7] = strong + piece
+      board.wk_pos = coords(strong_king if strong == 'w' else weak_king)
+      board.bk_pos = coords(weak_king if strong == 'w' else strong_king)
+      if randrange(2):
+        board.toggle_side()
+
+      # The side that just moved cannot be in check.
+      if board.to_move == weak or not attackers_to(board.bitboards, board.occupied, weak_king, strong):
+        return board
+
+  def test_known_positions(self):
+    # Mate in one, Qa8 or Qg7.
+    self.assertEqual(self.probe('7k/8/6K1/8/8/8/8/1Q6 w - - 0 1'), WIN_SCORE - 1)
+    self.assertEqual(self.probe('Q6k/8/6K1/8/8/8/8/8 b - - 0 1'), -WIN_SCORE)
+    # The rook hangs.
+    self.assertEqual(self.probe('8/8/8/8/8/8/1k6/R3K3 b - - 0 1'), 0)
+    # The defending king holds the corner in front of a rook pawn.
+    self.assertEqual(self.probe('k7/8/8/8/P7/8/8/7K w - - 0 1'), 0)
+    self.assertGreater(self.probe('8/8/8/8/8/2k5/4P3/4K3 w - - 0 1'), 0)
+    # Bare kings and a lone minor piece cannot win.
+    self.assertEqual(self.probe('8/8/3k4/8/8/3K4/8/8 w - - 0 1'), 0)
+    self.assertEqual(self.probe('8/8/3k4/8/8/3K4/3N4/8 w - - 0 1'), 0)
+    self.assertIsNone(self.probe('8/8/3k4/8/8/3K4/3RR3/8 w - - 0 1'))
+
+  def test_colors_are_mirrored(self):
+    self.assertEqual(self.probe('8/8/8/4k3/8/8/8/R3K3 w - - 0 1'), self.probe('r3k3/8/8/8/4K3/8/8/8 b - - 0 1'))
+    self.assertEqual(self.probe('8/8/8/4k3/8/8/8/R3K3 b - - 0 1'), self.probe('r3k3/8/8/8/4K3/8/8/8 w - - 0 1'))
+
+  def test_distances_are_consistent(self):
+    """
+    Each score must follow from the scores after every move: the best one for the side to move.
+    """
+    for piece in 'QRP':
+      for _ in range(60):
+        board = self.random_position(piece)
+        c = board.to_move
+        engine = Engine(board)
+        scores = []
+        for move in engine.generate_valid_moves(c):
+          board.make_move(move)
+          scores.append(-self.bitbases.probe(board, get_opposite_color(c)))
+          board.undo_move(move)
+
+        if not scores:
+          expected = -WIN_SCORE if engine.in_check else 0
+        else:
+          # The same result, one ply further away.
+          best = max(scores)
+          expected = best - 1 if best > 0 else best + 1 if best < 0 else 0
+        self.assertEqual(self.bitbases.probe(board, c), expected, board.to_fen())
+
+  def test_ai_mates_in_table_distance(self):
+    board = Board.from_fen('8/8/8/4k3/8/8/8/R3K3 w - - 0 1')
+    engine = Engine(board)
+    distance = WIN_SCORE - self.bitbases.probe(board, 'w')
+    players = {c: Ai(depth=1, color=c, tt_size_mb=0) for c in 'wb'}
+
+    c = 'w'
+    engine.refresh_moves_and_game_state(c)
+    for _ in range(distance):
+      move = players[c].find_optimal_move(engine)
+      board.make_move(move)
+      c = get_opposite_color(c)
+      engine.refresh_moves_and_game_state(c)
+    self.assertTrue(engine.checkmate)
+    self.assertEqual(c, 'b')
+
+  def test_missing_tables(self):
+    bitbases = Bitbases(os.path.join(current_dir, 'missing'))
+    board = Board.from_fen('8/8/8/4k3/8/8/8/R3K3 w - - 0 1')
+    self.assertIsNone(bitbases.probe(board, 'w'))
+    self.assertTrue(bitbases.tables['R'].missing)
+
+
+if __name__ == '__main__':
+  unittest.main()
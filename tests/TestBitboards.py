@@ -0,0 +1,133 @@
+import sys
+import os
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from board import Board
+from engine import Engine
+from move import Move
+from bitboard import (square, iter_squares, popcount, rook_attacks, bishop_attacks, attackers_to, attack_map,
+                      KNIGHT_ATTACKS, KNIGHT_TARGETS, KING_TARGETS, RAY_TARGETS, RAYS)
+
+
+class TestBitboards(unittest.TestCase):
+  def setUp(self):
+    self.board = Board(is_test_board=False)
+    self.engine = Engine(self.board)
+
+  def assertBitboardsInSync(self):
+    bitboards, occupancy = self.board.compute_bitboards()
+    self.assertEqual(self.board.bitboards, bitboards)
+    self.assertEqual(self.board.occupancy, occupancy)
+    self.assertEqual(self.board.occupied, occupancy['w'] | occupancy['b'])
+
+  def test_start_position(self):
+    self.assertEqual(popcount(self.board.occupied), 32)
+    self.assertEqual(popcount(self.board.bitboards['wP']), 8)
+    self.assertEqual(self.board.bitboards['bK'], 1 << square(4, 0))
+    self.assertEqual(self.board.bitboards['wK'], 1 << square(4, 7))
+
+  def test_direct_square_writes(self):
+    self.board.board[3][3] = 'wQ'
+    self.assertBitboardsInSync()
+    self.board.board[3][3] = 'bN'
+    self.assertBitboardsInSync()
+    self.board.board[3][3] = '--'
+    self.assertBitboardsInSync()
+
+    self.board.clear_board()
+    self.assertEqual(self.board.occupied, 0)
+
+  def test_make_undo_keeps_sync(self):
+    for move in self.engine.generate_valid_moves('w'):
+      self.board.make_move(move)
+      self.assertBitboardsInSync()
+      for reply in self.engine.generate_valid_moves('b'):
+        self.board.make_move(reply)
+        self.assertBitboardsInSync()
+        self.board.undo_move(reply)
+      self.board.undo_move(move)
+      self.assertBitboardsInSync()
+
+  def test_promotion_and_capture(self):
+    self.board.clear_board()
+    self.board.board[1][0] = 'wP'
+    self.board.board[0][1] = 'bR'
+
+    move = Move(0, 1, 1, 0, 'bR', True)
+    self.board.make_move(move)
+    self.assertBitboardsInSync()
+    self.assertEqual(self.board.bitboards['wQ'], 1 << square(1, 0))
+    self.assertEqual(self.board.bitboards['bR'], 0)
+
+    self.board.undo_move(move)
+    self.assertBitboardsInSync()
+    self.assertEqual(self.board.bitboards['wP'], 1 << square(0, 1))
+
+  def test_iter_squares(self):
+    self.assertEqual(list(iter_squares(0)), [])
+    self.assertEqual(list(iter_squares(0b1010)), [1, 3])
+    self.assertEqual(list(iter_squares(1 << 63)), [63])
+
+  def test_slider_attacks(self):
+    # Rook in a corner of an empty board sees fourteen squares.
+    self.assertEqual(popcount(rook_attacks(square(0, 0), 0)), 14)
+    # Bishop in the center of an empty board sees thirteen squares.
+    self.assertEqual(popcount(bishop_attacks(square(3, 3), 0)), 13)
+
+    # Blockers are included in the attack set, squares behind them are not.
+    blocker = 1 << square(0, 3)
+    attacks = rook_attacks(square(0, 0), blocker)
+    self.assertTrue(attacks & blocker)
+    self.assertFalse(attacks & (1 << square(0, 4)))
+
+  def test_knight_attacks(self):
+    self.assertEqual(popcount(KNIGHT_ATTACKS[square(0, 0)]), 2)
+    self.assertEqual(popcount(KNIGHT_ATTACKS[square(3, 3)]), 8)
+
+  def test_target_tables(self):
+    self.assertEqual(sorted(KNIGHT_TARGETS[square(0, 0)]), [(1, 2), (2, 1)])
+    self.assertEqual(len(KING_TARGETS[square(3, 3)]), 8)
+    self.assertEqual(len(KING_TARGETS[square(7, 7)]), 3)
+
+    # Rays are ordered nearest square first and stop at the edge.
+    self.assertEqual(RAY_TARGETS[(1, 1)][square(4, 4)], [(5, 5), (6, 6), (7, 7)])
+    self.assertEqual(RAY_TARGETS[(0, -1)][square(2, 0)], [])
+
+    for d, table in RAY_TARGETS.items():
+      for sq, targets in enumerate(table):
+        self.assertEqual(popcount(RAYS[d][sq]), len(targets))
+
+  def test_attackers_to(self):
+    self.board.clear_board()
+    self.board.board[3][3] = 'wK'
+    self.board.board[0][0] = 'bB'
+    self.board.board[3][0] = 'bR'
+    self.board.board[4][4] = 'bP'
+
+    attackers = attackers_to(self.board.bitboards, self.board.occupied, square(3, 3), 'b')
+    self.assertEqual(sorted(iter_squares(attackers)), sorted([square(0, 0), square(0, 3)]))
+
+    # Black pawns attack towards j + 1.
+    attackers = attackers_to(self.board.bitboards, self.board.occupied, square(3, 5), 'b')
+    self.assertEqual(list(iter_squares(attackers)), [square(4, 4)])
+
+  def test_attack_map(self):
+    # Black's pieces attack the third rank and nothing beyond it from the start position.
+    attacks = attack_map(self.board.bitboards, self.board.occupied, 'b')
+    self.assertEqual(attacks & (0xFF << 16), 0xFF << 16)
+    self.assertFalse(attacks & ~((1 << 24) - 1))
+
+    # Every attacked square has an attacker, and every other square has none.
+    self.engine.apply_coordinate_moves(['e2e4', 'd7d5', 'f1c4', 'c8g4'])
+    attacks = attack_map(self.board.bitboards, self.board.occupied, 'w')
+    for sq in range(64):
+      attackers = attackers_to(self.board.bitboards, self.board.occupied, sq, 'w')
+      self.assertEqual(bool(attacks >> sq & 1), bool(attackers))
+
+
+if __name__ == '__main__':
+  unittest.main()
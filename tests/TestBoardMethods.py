@@ -8,7 +8,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from board import Board, EMPTY_BOARD
+from board import Board, EMPTY_BOARD, START_FEN
 from engine import Engine
 
 
@@ -61,6 +61,116 @@ class TestBoardMethods(unittest.TestCase):
     self.board.undo_move(move)
     self.assertEqual(self.board.score_board(), -7.3)
 
+  def test_incremental_score_matches_recompute(self):
+    board = Board(debug=True)
+    engine = Engine(board)
+    self.assertEqual(board.score_board(), board.compute_score() / 100)
+
+    for move in engine.generate_valid_moves('w'):
+      board.make_move(move)
+      for reply in engine.generate_valid_moves('b'):
+        board.make_move(reply)
+        board.score_board()
+        board.undo_move(reply)
+      board.score_board()
+      board.undo_move(move)
+
+    self.assertEqual(board.score, board.compute_score())
+
+  def test_debug_score_detects_drift(self):
+    board = Board(debug=True)
+    board.score += 1
+    with self.assertRaises(AssertionError):
+      board.score_board()
+
+  def test_incremental_hash_matches_recompute(self):
+    board = Board(debug=True)
+    engine = Engine(board)
+    start_hash = board.hash
+
+    for move in engine.generate_valid_moves('w'):
+      board.make_move(move)
+      self.assertNotEqual(board.hash, start_hash)
+      for reply in engine.generate_valid_moves('b'):
+        board.make_move(reply)
+        board.undo_move(reply)
+      board.undo_move(move)
+
+    self.assertEqual(board.hash, start_hash)
+    self.assertEqual(board.hash, board.compute_hash())
+
+  def test_hash_transposition(self):
+    # The same position reached through different move orders shares a key.
+    self.board.make_move(Move(6, 7, 5, 5))
+    self.board.make_move(Move(6, 0, 5, 2))
+    self.board.make_move(Move(1, 7, 2, 5))
+    after_one_order = self.board.hash
+
+    other = Board()
+    other.make_move(Move(1, 7, 2, 5))
+    other.make_move(Move(6, 0, 5, 2))
+    other.make_move(Move(6, 7, 5, 5))
+    self.assertEqual(other.hash, after_one_order)
+
+  def test_hash_side_to_move(self):
+    key = self.board.hash
+    self.board.toggle_side()
+    self.assertNotEqual(self.board.hash, key)
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+
+  def test_hash_direct_square_writes(self):
+    self.board.board[3][3] = 'wQ'
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+    self.board.clear_board()
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+
+  def test_copy(self):
+    self.board.make_move(Move(4, 6, 4, 4))
+    copy = self.board.copy()
+    self.assertEqual(copy.board, self.board.board)
+    self.assertEqual(copy.hash, self.board.hash)
+    self.assertEqual(copy.score, self.board.score)
+    self.assertEqual(copy.to_move, 'b')
+
+    # Moves on the copy leave the original alone.
+    copy.make_move(Move(4, 1, 4, 3))
+    self.assertEqual(self.board.board[1][4], 'bP')
+    self.assertNotEqual(copy.hash, self.board.hash)
+    self.assertEqual(self.board.bitboards, self.board.compute_bitboards()[0])
+
+  def test_fen_start_position(self):
+    board = Board.from_fen(START_FEN)
+    self.assertEqual(board.board, Board().board)
+    self.assertEqual(board.hash, Board().hash)
+    self.assertEqual(board.score, Board().score)
+    self.assertEqual(Board().to_fen(), START_FEN)
+
+  def test_fen_round_trip(self):
+    fen = 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b - - 0 1'
+    board = Board.from_fen(fen)
+    self.assertEqual(board.to_fen(), fen)
+    self.assertEqual(board.to_move, 'b')
+    self.assertEqual(board.board[3][7], 'wQ')
+    self.assertEqual(board.bitboards, board.compute_bitboards()[0])
+    self.assertEqual(board.score, board.compute_score())
+
+  def test_fen_side_to_move_and_kings(self):
+    board = Board.from_fen('8/8/3k4/8/8/8/8/K7 b - - 0 1')
+    self.assertEqual(board.wk_pos, (0, 7))
+    self.assertEqual(board.bk_pos, (3, 2))
+
+    # Same position as reaching it by a move, so hashes line up with positions played on the board.
+    played = Board.from_fen('8/8/8/3k4/8/8/8/K7 b - - 0 1')
+    played.make_move(Move(3, 3, 3, 2))
+    played.toggle_side()
+    self.assertEqual(played.hash, board.hash)
+
+  def test_fen_invalid(self):
+    for fen in ['', '8/8/8/8/8/8/8 w', '9/8/8/8/8/8/8/8 w', 'rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w',
+                '8/8/8/8/8/8/8/8 x']:
+      with self.assertRaises(ValueError):
+        Board.from_fen(fen)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -77,6 +77,21 @@ class TestChessNotation(unittest.TestCase):
     move = Move(2, 0, 3, 0)
     self.assertEqual(self.board.log_move(move, True, True), 'Qd8#')
 
+  def test_disambiguation(self):
+    self.board.clear_board()
+    self.board.board[6][3] = 'wN'
+    self.board.board[5][5] = 'wN'
+    self.assertEqual(self.board.log_move(Move(1, 7, 3, 6)), 'Nbd2')
+    self.board.clear_board()
+    self.board.board[5][0] = 'wR'
+    self.board.board[3][0] = 'wR'
+    self.assertEqual(self.board.log_move(Move(0, 7, 0, 5)), 'R1a3')
+    # Before the move, the rook on a1 was blocked by the one leaving a2.
+    self.board.clear_board()
+    self.board.board[7][0] = 'wR'
+    self.board.board[4][0] = 'wR'
+    self.assertEqual(self.board.log_move(Move(0, 6, 0, 4)), 'Ra4')
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -1,6 +1,7 @@
 import sys
 import os
 import unittest
+from random import choice, seed
 from typing import List
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -9,6 +10,7 @@ sys.path.append(parent_dir)
 
 from board import Board
 from engine import Engine
+from helpers import get_opposite_color
 from move import Move
 
 
@@ -69,6 +71,96 @@ class TestGenericMoveGeneration(unittest.TestCase):
     self.assertEqual(self.engine.checkmate, False)
     self.assertEqual(len(actual_moves), 0)
 
+  def test_move_key(self):
+    move = Move(4, 6, 4, 4)
+    self.assertEqual(move, Move(4, 6, 4, 4, None, False))
+    self.assertNotEqual(move, Move(4, 6, 4, 5))
+    self.assertEqual(hash(move), hash(Move(4, 6, 4, 4)))
+    self.assertEqual(len({move, Move(4, 6, 4, 4), Move(3, 6, 3, 4)}), 2)
+
+    restored = Move.from_key(move.key)
+    self.assertEqual((restored.i, restored.j, restored.ni, restored.nj), (4, 6, 4, 4))
+
+    keys = {move.key for move in self.engine.generate_valid_moves('w')}
+    self.assertEqual(len(keys), 20)
+    self.assertTrue(all(0 <= key < 4096 for key in keys))
+
+  def test_move_has_no_dict(self):
+    with self.assertRaises(AttributeError):
+      Move(0, 0, 1, 1).extra = True
+
+  def test_move_cache(self):
+    self.engine.refresh_moves_and_game_state('w')
+    moves = self.engine.white_moves
+    self.assertEqual(self.engine.move_cache_misses, 1)
+
+    # An unchanged position is answered from the cache.
+    self.engine.refresh_moves_and_game_state('w')
+    self.assertIs(self.engine.white_moves, moves)
+    self.assertEqual(self.engine.move_cache_hits, 1)
+
+    move = Move(4, 6, 4, 4)
+    self.board.make_move(move)
+    self.engine.refresh_moves_and_game_state('b')
+    self.board.undo_move(move)
+    self.engine.refresh_moves_and_game_state('w')
+    self.assertIs(self.engine.white_moves, moves)
+    self.assertEqual(self.engine.move_cache_misses, 2)
+
+  def test_move_cache_game_state(self):
+    self.engine.apply_coordinate_moves(['f2f3', 'e7e5', 'g2g4', 'd8h4'])
+    for _ in range(2):
+      self.engine.refresh_moves_and_game_state('w')
+      self.assertTrue(self.engine.in_check)
+      self.assertTrue(self.engine.checkmate)
+      self.assertEqual(self.engine.winner, 'b')
+      self.assertEqual(self.engine.white_moves, [])
+    self.assertEqual(self.engine.move_cache_hits, 1)
+
+  def test_move_cache_is_bounded(self):
+    self.engine.move_cache_size = 4
+    for i in range(8):
+      self.board.board[4][i] = 'wN'
+      self.engine.refresh_moves_and_game_state('w')
+      self.board.board[4][i] = '--'
+    self.assertEqual(len(self.engine.move_cache), 4)
+
+    # The oldest positions were evicted, the newest are still there.
+    self.board.board[4][7] = 'wN'
+    self.engine.refresh_moves_and_game_state('w')
+    self.assertEqual(self.engine.move_cache_hits, 1)
+    self.board.board[4][7] = '--'
+    self.board.board[4][0] = 'wN'
+    self.engine.refresh_moves_and_game_state('w')
+    self.assertEqual(self.engine.move_cache_hits, 1)
+
+  def test_moves_from(self):
+    self.engine.refresh_moves_and_game_state('w')
+    self.assertEqual(sorted((move.ni, move.nj) for move in self.engine.moves_from(6, 7)), [(5, 5), (7, 5)])
+    self.assertEqual(self.engine.moves_from(4, 7), [])
+    self.assertEqual(sum(len(moves) for moves in self.engine.moves_by_origin['w'].values()), 20)
+
+  def test_valid_captures(self):
+    seed(1)
+    positions = 0
+    for _ in range(20):
+      board = Board()
+      engine = Engine(board)
+      c = 'w'
+      for _ in range(80):
+        moves = engine.generate_valid_moves(c)
+        if not moves:
+          break
+        captures = engine.generate_valid_captures(c)
+        # The same moves, in the same order, as filtering the legal moves.
+        expected = [move for move in moves if move.captured_piece is not None or move.promote]
+        self.assertEqual([(move, move.captured_piece, move.promote) for move in captures],
+                         [(move, move.captured_piece, move.promote) for move in expected], board.to_fen())
+        positions += 1
+        board.make_move(choice(moves))
+        c = get_opposite_color(c)
+    self.assertGreater(positions, 500)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -157,6 +157,30 @@ class TestKingMoveGeneration(unittest.TestCase):
     actual_moves = self.engine.generate_king_moves(0, 0)
     self.assertEqual(len(actual_moves), 1)
 
+  def test_king_cannot_retreat_along_check(self):
+    self.board.board[3][3] = 'wK'
+    self.board.board[0][3] = 'bR'
+    self.board.wk_pos = (3, 3)
+
+    # The rook sees through the king, so stepping straight back stays in check.
+    actual_moves = self.engine.generate_king_moves(3, 3)
+    self.assertNotIn(Move(3, 3, 3, 4), actual_moves)
+    self.assertNotIn(Move(3, 3, 3, 2), actual_moves)
+    self.assertEqual(len(actual_moves), 6)
+
+  def test_king_cannot_capture_defended_piece(self):
+    self.board.board[3][3] = 'wK'
+    self.board.board[2][3] = 'bN'
+    self.board.board[0][3] = 'bR'
+    self.board.wk_pos = (3, 3)
+
+    actual_moves = self.engine.generate_king_moves(3, 3)
+    self.assertNotIn(Move(3, 3, 3, 2, 'bN'), actual_moves)
+
+    # Once the defender is gone, the capture is fine.
+    self.board.board[0][3] = '--'
+    self.assertIn(Move(3, 3, 3, 2, 'bN'), self.engine.generate_king_moves(3, 3))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,78 @@
+import sys
+import os
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from board import Board
+from engine import Engine
+from move import Move
+from ordering import MoveOrderer
+
+
+class TestMoveOrdering(unittest.TestCase):
+  def setUp(self):
+    self.board = Board(is_test_board=True)
+    self.engine = Engine(self.board)
+    self.orderer = MoveOrderer()
+
+    self.board.board[7][4] = 'wK'
+    self.board.board[4][3] = 'wQ'
+    self.board.board[6][0] = 'wP'
+    self.board.board[3][2] = 'bP'
+    self.board.board[1][3] = 'bR'
+    self.board.board[5][1] = 'bN'
+    self.board.board[0][4] = 'bK'
+    self.board.bk_pos = (4, 0)
+
+  def test_captures_by_mvv_lva(self):
+    moves = self.orderer.order(self.engine.generate_valid_moves('w'), self.board, 0)
+    captures = [move for move in moves if move.captured_piece is not None]
+
+    # Pawn takes knight (3 - 1), queen takes rook (5 - 9), queen takes pawn (1 - 9).
+    self.assertEqual(captures, [Move(0, 6, 1, 5), Move(3, 4, 3, 1), Move(3, 4, 2, 3)])
+    self.assertEqual(moves[:len(captures)], captures)
+
+  def test_hash_move_first(self):
+    hash_move = Move(0, 6, 0, 5)
+    moves = self.orderer.order(self.engine.generate_valid_moves('w'), self.board, 0, hash_move)
+    self.assertEqual(moves[0], hash_move)
+
+  def test_killers_and_history(self):
+    quiet = Move(3, 4, 3, 5)
+    other = Move(3, 4, 4, 4)
+    self.orderer.record_cutoff(self.board, quiet, 2, 3)
+    self.assertEqual(self.orderer.killers[2], [quiet.key, None])
+
+    self.orderer.record_cutoff(self.board, other, 2, 3)
+    self.assertEqual(self.orderer.killers[2], [other.key, quiet.key])
+
+    moves = self.orderer.order(self.engine.generate_valid_moves('w'), self.board, 2)
+    # Killers come straight after the captures.
+    self.assertEqual(moves[3:5], [other, quiet])
+
+    # On another ply only the history applies, which both moves share.
+    moves = self.orderer.order(self.engine.generate_valid_moves('w'), self.board, 3)
+    self.assertEqual(set(map(repr, moves[3:5])), {repr(other), repr(quiet)})
+
+  def test_captures_skip_killers(self):
+    self.orderer.record_cutoff(self.board, Move(3, 4, 3, 1, 'bR'), 0, 3)
+    self.assertEqual(self.orderer.killers[0], [None, None])
+
+  def test_new_search_ages_history(self):
+    move = Move(3, 4, 3, 5)
+    self.orderer.record_cutoff(self.board, move, 0, 4)
+    self.orderer.new_search()
+    self.assertEqual(self.orderer.killers[0], [None, None])
+    self.assertEqual(self.orderer.history['w'][move.key], 8)
+
+  def test_disabled_stages_keep_order(self):
+    orderer = MoveOrderer(hash_move=False, captures=False, killers=False, history=False)
+    moves = self.engine.generate_valid_moves('w')
+    self.assertEqual(orderer.order(moves, self.board, 0, moves[-1]), moves)
+
+
+if __name__ == '__main__':
+  unittest.main()
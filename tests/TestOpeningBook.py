@@ -0,0 +1,131 @@
+import sys
+import os
+import unittest
+from random import seed
+from tempfile import TemporaryDirectory
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from board import Board
+from book import OpeningBook, RECORD, count_book_moves, write_book
+from engine import Engine
+from move import Move
+from parallel import LazySmpAi
+from replay import read_games
+
+GAMES = '''
+1 e4 e5
+2 Nf3 Nc6
+
+1. e4 c5 2. Nf3 d6 1-0
+
+[Event "Third"]
+
+1. d4 d5 2. c4 *
+'''
+
+
+class TestOpeningBook(unittest.TestCase):
+  def setUp(self):
+    seed(0)
+    self.directory = TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'book.bin')
+    self.counts = count_book_moves(read_games(GAMES.splitlines()), plies=3)
+    write_book(self.counts, self.path)
+    self.book = OpeningBook(self.path)
+
+  def tearDown(self):
+    self.book.close()
+    self.directory.cleanup()
+
+  def test_counts(self):
+    start = Board().hash
+    self.assertEqual(self.counts[start, Move(4, 6, 4, 4).key], 2)
+    self.assertEqual(self.counts[start, Move(3, 6, 3, 4).key], 1)
+    # Three plies of each game, two of which open with the same move.
+    self.assertEqual(sum(self.counts.values()), 9)
+    self.assertEqual(len(self.book), 8)
+
+  def test_castling_ends_a_game(self):
+    # Castling written with zeros, in a log as Board.log_game prints it.
+    games = list(read_games(['1 e4 e5', '2 Nf3 Nc6', '3 Bc4 Bc5', '4 0-0 Nf6']))
+    self.assertEqual(games[0][1][6], '0-0')
+    # Castling cannot be replayed, so only the moves before it are counted.
+    counts = count_book_moves(games, plies=16)
+    self.assertEqual(sum(counts.values()), 6)
+
+  def test_records_are_sorted(self):
+    keys = [RECORD.unpack_from(self.book.data, index * RECORD.size)[0] for index in range(len(self.book))]
+    self.assertEqual(keys, sorted(keys))
+
+  def test_entries(self):
+    entries = dict(self.book.entries(Board().hash))
+    self.assertEqual(entries, {Move(4, 6, 4, 4).key: 2, Move(3, 6, 3, 4).key: 1})
+    self.assertEqual(self.book.entries(12345), [])
+
+  def test_choose_returns_legal_moves(self):
+    board = Board()
+    engine = Engine(board)
+    engine.refresh_moves_and_game_state('w')
+    chosen = {self.book.choose(board, engine.white_moves) for _ in range(50)}
+    self.assertEqual(chosen, {Move(4, 6, 4, 4), Move(3, 6, 3, 4)})
+
+    # A book move that is not legal here is never played.
+    self.assertIsNone(self.book.choose(board, [Move(0, 6, 0, 5)]))
+    self.assertEqual(self.book.misses, 1)
+
+  def test_ai_plays_from_book(self):
+    board = Board()
+    engine = Engine(board)
+    board.make_move(Move(4, 6, 4, 4))
+    engine.refresh_moves_and_game_state('b')
+
+    ai = Ai(depth=3, book_path=self.path)
+    move = ai.find_optimal_move(engine)
+    self.assertIn(move, [Move(4, 1, 4, 3), Move(2, 1, 2, 3)])
+    self.assertEqual(ai.nodes, 0)
+
+    # Out of book, the AI searches as usual.
+    board.make_move(Move(0, 1, 0, 2))
+    board.make_move(Move(0, 6, 0, 5))
+    engine.refresh_moves_and_game_state('b')
+    self.assertIsNotNone(ai.find_optimal_move(engine))
+    self.assertGreater(ai.nodes, 0)
+    ai.book.close()
+
+  def test_lazy_smp_plays_from_book(self):
+    board = Board()
+    engine = Engine(board)
+    board.make_move(Move(4, 6, 4, 4))
+    engine.refresh_moves_and_game_state('b')
+
+    ai = LazySmpAi(depth=3, workers=2, book_path=self.path)
+    try:
+      self.assertIn(ai.find_optimal_move(engine), [Move(4, 1, 4, 3), Move(2, 1, 2, 3)])
+      # The book is consulted once, and the helpers are never started.
+      self.assertEqual(ai.book.hits, 1)
+      self.assertIsNone(ai.executor)
+    finally:
+      ai.close()
+      ai.book.close()
+
+  def test_empty_and_invalid_files(self):
+    empty = os.path.join(self.directory.name, 'empty.bin')
+    write_book(self.counts, empty, min_count=10)
+    book = OpeningBook(empty)
+    self.assertEqual(len(book), 0)
+    self.assertEqual(book.entries(Board().hash), [])
+    book.close()
+
+    invalid = os.path.join(self.directory.name, 'invalid.bin')
+    with open(invalid, 'wb') as file:
+      file.write(b'\0' * (RECORD.size + 1))
+    with self.assertRaises(ValueError):
+      OpeningBook(invalid)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,119 @@
+import sys
+import os
+import unittest
+from random import seed
+from threading import Event
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from helpers import get_opposite_color
+from move import Move
+from parallel import LazySmpAi, ParallelAi
+
+
+class TestParallelSearch(unittest.TestCase):
+  def setUp(self):
+    seed(0)
+    self.board = Board()
+    self.engine = Engine(self.board)
+    self.board.make_move(Move(4, 6, 4, 4))
+    self.engine.refresh_moves_and_game_state('b')
+
+  def search(self, ai: Ai, stop_event=None):
+    try:
+      return ai.find_optimal_move(self.engine, stop_event)
+    finally:
+      if isinstance(ai, (ParallelAi, LazySmpAi)):
+        ai.close()
+
+  def root_score(self, ai: Ai) -> float:
+    return ai.transposition_table.probe(self.board.hash).score
+
+  def test_matches_serial_search(self):
+    serial = Ai(depth=3)
+    serial_move = self.search(serial)
+
+    parallel = ParallelAi(depth=3, workers=2)
+    parallel_move = self.search(parallel)
+
+    self.assertEqual(parallel.completed_depth, 3)
+    self.assertEqual(self.root_score(parallel), self.root_score(serial))
+    self.assertEqual(parallel_move, serial_move)
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+    self.assertEqual(self.board.board[4][4], 'wP')
+
+  def test_finds_mate_in_one(self):
+    self.board.clear_board()
+    self.board.board[0][7] = 'bK'
+    self.board.board[7][0] = 'wK'
+    self.board.board[6][7] = 'bR'
+    self.board.board[1][2] = 'bR'
+    self.board.board[4][4] = 'wP'
+    self.board.bk_pos = (7, 0)
+    self.board.wk_pos = (0, 7)
+    self.engine.refresh_moves_and_game_state('b')
+
+    ai = ParallelAi(depth=2, workers=2, parallel_depth=2)
+    self.assertEqual(self.search(ai), Move(2, 1, 2, 7))
+
+  def test_parallel_iterations_skip_aspiration(self):
+    # Every iteration after the first is split over the pool.
+    ai = ParallelAi(depth=4, workers=2, parallel_depth=2, aspiration_window=0.01)
+    self.search(ai)
+    self.assertEqual(ai.completed_depth, 4)
+    self.assertEqual(ai.stats.aspiration_researches, 0)
+
+  def test_principal_variation(self):
+    ai = ParallelAi(depth=4, workers=2)
+    try:
+      move, line, stats = ai.search(self.engine)
+    finally:
+      ai.close()
+    self.assertEqual(line[0], move)
+    self.assertGreater(len(line), 1)
+    self.assertEqual(len(stats.pv), len(line))
+
+    # The line is legal all the way, whichever process searched it.
+    c = 'b'
+    for pv_move in line:
+      self.assertIn(pv_move, self.engine.generate_valid_moves(c))
+      self.board.make_move(pv_move)
+      c = get_opposite_color(c)
+
+  def test_serial_below_parallel_depth(self):
+    ai = ParallelAi(depth=2, workers=2)
+    self.assertIn(self.search(ai), self.engine.black_moves)
+    # The pool is only started once an iteration is deep enough to use it.
+    self.assertIsNone(ai.executor)
+
+  def test_stop_event_cancels_search(self):
+    stop_event = Event()
+    stop_event.set()
+    ai = ParallelAi(depth=6, workers=2)
+    self.assertIsNone(self.search(ai, stop_event))
+    self.assertEqual(ai.completed_depth, 0)
+
+  def test_lazy_smp_search(self):
+    ai = LazySmpAi(depth=3, workers=3)
+    move = self.search(ai)
+    # Helpers may leave deeper results in the table, so the move need not match a plain depth 3 search.
+    self.assertIn(move, self.engine.black_moves)
+    self.assertEqual(ai.completed_depth, 3)
+    self.assertEqual(self.board.hash, self.board.compute_hash())
+    self.assertEqual(self.board.board[4][4], 'wP')
+
+  def test_lazy_smp_stop_event_cancels_search(self):
+    stop_event = Event()
+    stop_event.set()
+    ai = LazySmpAi(depth=6, workers=2)
+    self.assertIsNone(self.search(ai, stop_event))
+    self.assertEqual(ai.completed_depth, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
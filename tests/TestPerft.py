@@ -0,0 +1,69 @@
+import sys
+import os
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from board import Board
+from engine import Engine
+from perft import perft, divide, parallel_divide, setup_position, START_POSITION_COUNTS
+
+
+class TestPerft(unittest.TestCase):
+  def setUp(self):
+    self.board = Board()
+    self.engine = Engine(self.board)
+
+  def test_start_position_counts(self):
+    for depth in range(1, 4):
+      self.assertEqual(perft(self.engine, 'w', depth), START_POSITION_COUNTS[depth])
+
+  def test_board_restored(self):
+    key = self.board.hash
+    perft(self.engine, 'w', 3)
+    self.assertEqual(self.board.hash, key)
+    self.assertEqual(self.board.score, self.board.compute_score())
+
+  def test_divide(self):
+    counts = divide(self.engine, 'w', 3)
+    self.assertEqual(len(counts), 20)
+    self.assertEqual(counts['e2e4'], 600)
+    self.assertEqual(counts['g1f3'], 440)
+    self.assertEqual(sum(counts.values()), START_POSITION_COUNTS[3])
+
+  def test_parallel_divide(self):
+    counts = parallel_divide(['e2e4'], 2, workers=2)
+    self.engine.apply_coordinate_moves(['e2e4'])
+    self.assertEqual(counts, divide(self.engine, 'b', 2))
+
+  def test_promotions(self):
+    self.board.clear_board()
+    self.board.board[1][0] = 'wP'
+    self.board.board[7][7] = 'wK'
+    self.board.board[0][7] = 'bK'
+    self.board.wk_pos = (7, 7)
+    self.board.bk_pos = (7, 0)
+
+    counts = divide(self.engine, 'w', 1)
+    self.assertIn('a7a8q', counts)
+    self.assertEqual(sum(counts.values()), 4)
+
+  def test_illegal_coordinate_move(self):
+    with self.assertRaises(ValueError):
+      self.engine.apply_coordinate_moves(['e2e5'])
+
+  def test_fen_position(self):
+    # Published counts for this position, which has no castling and no en passant before depth 3.
+    engine, c = setup_position([], '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1')
+    self.assertEqual(c, 'w')
+    self.assertEqual(perft(engine, c, 1), 14)
+    self.assertEqual(perft(engine, c, 2), 191)
+
+    engine, c = setup_position(['a5a4'], '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1')
+    self.assertEqual(c, 'b')
+
+
+if __name__ == '__main__':
+  unittest.main()
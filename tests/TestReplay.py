@@ -0,0 +1,104 @@
+import sys
+import os
+import unittest
+from random import choice, seed
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from board import Board
+from engine import Engine
+from helpers import get_opposite_color
+from move import Move
+from replay import SanReplayer, read_games, replay_game, tokenize
+
+
+class TestReplay(unittest.TestCase):
+  def play_random_game(self, plies: int) -> Board:
+    board = Board()
+    engine = Engine(board)
+    c = 'w'
+    for _ in range(plies):
+      engine.refresh_moves_and_game_state(c)
+      moves = engine.white_moves if c == 'w' else engine.black_moves
+      if not moves:
+        break
+      move = choice(moves)
+      board.make_move(move)
+      c = get_opposite_color(c)
+      engine.refresh_moves_and_game_state(c)
+      board.log_move(move, engine.in_check, engine.checkmate)
+    return board
+
+  def test_round_trip_of_logged_games(self):
+    seed(0)
+    for _ in range(5):
+      played = self.play_random_game(120)
+      replayed = replay_game(played.game_log)
+      self.assertEqual(replayed.to_fen(), played.to_fen())
+      self.assertEqual(replayed.hash, played.hash)
+
+  def test_replay_writes_the_same_log(self):
+    moves = ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'Bxc6', 'dxc6']
+    replayer = SanReplayer(log=True)
+    list(replayer.replay(moves))
+    self.assertEqual(replayer.board.game_log, moves)
+
+  def test_disambiguated_moves(self):
+    board = Board.from_fen('4k3/8/8/8/8/5N2/8/1N2K2R w - - 0 1')
+    replayer = SanReplayer(board)
+    self.assertEqual(replayer.resolve('Nbd2'), Move(1, 7, 3, 6))
+    self.assertEqual(replayer.resolve('Nfd2'), Move(5, 5, 3, 6))
+    self.assertEqual(replayer.resolve('N1d2'), Move(1, 7, 3, 6))
+    with self.assertRaises(ValueError):
+      replayer.resolve('Nd2')
+
+  def test_pinned_piece_is_not_a_candidate(self):
+    # The knight on d2 is pinned by the bishop, so only the one on g1 may move.
+    board = Board.from_fen('4k3/8/8/b7/8/8/3N4/4K1N1 w - - 0 1')
+    replayer = SanReplayer(board)
+    self.assertEqual(replayer.resolve('Nf3'), Move(6, 7, 5, 5))
+    with self.assertRaises(ValueError):
+      replayer.resolve('Ne4')
+
+  def test_pawn_moves(self):
+    board = Board.from_fen('4k3/P7/8/3p4/4P3/8/6P1/4K3 w - - 0 1')
+    replayer = SanReplayer(board)
+    self.assertEqual(replayer.resolve('g4'), Move(6, 6, 6, 4))
+    self.assertEqual(replayer.resolve('exd5'), Move(4, 4, 3, 3, 'bP'))
+    self.assertEqual(replayer.resolve('a8=Q+'), Move(0, 1, 0, 0, None, True))
+    for token in ('e6', 'g5', 'd5', 'exd6', 'a8=N', 'O-O', 'Kf3'):
+      with self.assertRaises(ValueError):
+        replayer.resolve(token)
+
+  def test_tokenize(self):
+    text = '1. e4 e5 {best by test} 2. Nf3 (2. f4 exf4) Nc6 $1 3.Bb5 a6?! 4... ; comment\n 1-0'
+    self.assertEqual(list(tokenize(text)), ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6?!'])
+    # As printed by Board.log_game.
+    self.assertEqual(list(tokenize('1 e4 e5')), ['e4', 'e5'])
+    self.assertEqual(list(tokenize('5. 0-0 0-0-0 6.O-O')), ['0-0', '0-0-0', 'O-O'])
+
+  def test_read_games(self):
+    lines = [
+      '[Event "Test"]',
+      '[FEN "4k3/8/8/8/8/8/8/4K2R w - - 0 1"]',
+      '',
+      '1. Rh8+ Kd7 2. Rh7+ *',
+      '[Event "Other"]',
+      '1. d4 d5',
+      '',
+      '1 c4 e5',
+    ]
+    games = list(read_games(lines))
+    self.assertEqual(len(games), 3)
+    tags, moves = games[0]
+    self.assertEqual(tags['Event'], 'Test')
+    self.assertEqual(moves, ['Rh8+', 'Kd7', 'Rh7+'])
+    self.assertEqual(replay_game(moves, tags['FEN']).to_fen(), '8/3k3R/8/8/8/8/8/4K3 b - - 0 1')
+    self.assertEqual(games[1], ({'Event': 'Other'}, ['d4', 'd5']))
+    self.assertEqual(games[2], ({}, ['c4', 'e5']))
+
+
+if __name__ == '__main__':
+  unittest.main()
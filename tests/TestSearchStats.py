@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+import unittest
+from random import seed
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from move import Move
+from parallel import ParallelAi
+from stats import SearchStats
+
+
+class TestSearchStats(unittest.TestCase):
+  def setUp(self):
+    seed(0)
+    self.board = Board()
+    self.engine = Engine(self.board)
+    self.board.make_move(Move(4, 6, 4, 4))
+    self.engine.refresh_moves_and_game_state('b')
+
+  def test_search_returns_stats(self):
+    ai = Ai(depth=3)
+    move, line, stats = ai.search(self.engine)
+    self.assertIn(move, self.engine.black_moves)
+    self.assertEqual(line[0], move)
+    self.assertIs(stats, ai.stats)
+    self.assertEqual(len(stats.pv), len(line))
+
+    self.assertEqual(stats.depth, 3)
+    self.assertEqual(stats.nodes, ai.nodes)
+    self.assertEqual(stats.quiescence_nodes, ai.quiescence_nodes)
+    self.assertGreater(stats.nodes_per_second, 0)
+    self.assertEqual([iteration.depth for iteration in stats.iterations], [1, 2, 3])
+    self.assertEqual(sum(iteration.nodes for iteration in stats.iterations), stats.nodes)
+    self.assertEqual(stats.iterations[0].branching_factor, 0)
+    self.assertGreater(stats.iterations[2].branching_factor, 1)
+
+    self.assertGreater(stats.beta_cutoffs, 0)
+    self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+    self.assertGreater(stats.tt_probes, 0)
+    self.assertLessEqual(stats.tt_hits, stats.tt_probes)
+    # Not profiled.
+    self.assertEqual(stats.movegen_time, 0)
+
+  def test_counters_are_per_search(self):
+    ai = Ai(depth=2)
+    ai.find_optimal_move(self.engine)
+    first = ai.stats
+    ai.find_optimal_move(self.engine)
+    self.assertIsNot(ai.stats, first)
+    self.assertEqual(ai.stats.tt_probes, ai.transposition_table.probes - first.tt_probes)
+
+  def test_parallel_search_adds_worker_counters(self):
+    _, _, serial = Ai(depth=4).search(self.engine)
+    ai = ParallelAi(depth=4, workers=2)
+    try:
+      _, _, stats = ai.search(self.engine)
+    finally:
+      ai.close()
+    # Most of the tree is searched by the workers, so their counters make up most of the totals.
+    self.assertGreater(stats.beta_cutoffs, serial.beta_cutoffs / 2)
+    self.assertGreater(stats.first_move_cutoffs, serial.first_move_cutoffs / 2)
+    self.assertGreater(stats.tt_probes, serial.tt_probes / 2)
+
+  def test_profile(self):
+    ai = Ai(depth=2, profile=True)
+    _, _, stats = ai.search(self.engine)
+    self.assertGreater(stats.movegen_time, 0)
+    self.assertGreater(stats.eval_time, 0)
+    self.assertLess(stats.movegen_time + stats.eval_time, stats.time)
+
+  def test_json_line(self):
+    stats = SearchStats()
+    stats.nodes, stats.time = 300, 0.5
+    stats.beta_cutoffs, stats.first_move_cutoffs = 4, 3
+    stats.add_iteration(1, 100, 0.1)
+    stats.add_iteration(2, 200, 0.4)
+
+    line = stats.to_json(game=3)
+    self.assertNotIn('\n', line)
+    data = json.loads(line)
+    self.assertEqual(data['game'], 3)
+    self.assertEqual(data['nps'], 600)
+    self.assertEqual(data['first_move_cutoff_rate'], 0.75)
+    self.assertEqual([iteration['branching_factor'] for iteration in data['iterations']], [0, 2])
+
+
+if __name__ == '__main__':
+  unittest.main()
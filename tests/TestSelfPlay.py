@@ -0,0 +1,68 @@
+import sys
+import os
+import unittest
+from math import inf
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from selfplay import elo_difference, match_elo, parse_settings, percentile, play_game, run_match
+
+
+class TestSelfPlay(unittest.TestCase):
+  def test_parse_settings(self):
+    self.assertEqual(parse_settings('depth=3,time_limit=0.5'), {'depth': 3, 'time_limit': 0.5})
+    self.assertEqual(parse_settings(''), {})
+    with self.assertRaises(ValueError):
+      parse_settings('depth')
+
+  def test_elo_difference(self):
+    self.assertEqual(elo_difference(0.5), 0)
+    self.assertAlmostEqual(elo_difference(0.75), 190.85, places=2)
+    self.assertAlmostEqual(elo_difference(0.25), -190.85, places=2)
+    self.assertEqual(elo_difference(1), inf)
+
+  def test_match_elo(self):
+    elo, low, high = match_elo([1, 0, 0.5, 0.5])
+    self.assertEqual(elo, 0)
+    self.assertLess(low, 0)
+    self.assertAlmostEqual(high, -low)
+
+    # Identical results leave no uncertainty.
+    self.assertEqual(match_elo([0.5] * 10), (0, 0, 0))
+
+  def test_percentile(self):
+    values = [0.5, 0.1, 0.4, 0.2, 0.3]
+    self.assertEqual(percentile(values, 50), 0.3)
+    self.assertEqual(percentile(values, 90), 0.5)
+    self.assertEqual(percentile(values, 0), 0.1)
+    self.assertEqual(percentile([], 50), 0.0)
+
+  def test_play_game(self):
+    result = play_game('e2e4 e7e5', {'depth': 1, 'quiescence_depth': 0}, {'depth': 1, 'quiescence_depth': 0},
+                       True, 10, 0)
+    self.assertIn(result.score, (0, 0.5, 1))
+    self.assertLessEqual(result.plies, 10)
+    self.assertEqual(len(result.move_times['a']) + len(result.move_times['b']), result.plies)
+    self.assertGreater(result.nodes['a'], 0)
+    self.assertEqual(len(result.search_stats), result.plies)
+    self.assertEqual(result.search_stats[0].player, 'a')
+
+  def test_run_match_swaps_colors(self):
+    results = run_match({'depth': 1, 'quiescence_depth': 0}, {'depth': 1, 'quiescence_depth': 0}, 2,
+                        max_plies=4)
+    self.assertEqual(len(results), 2)
+    # The first configuration plays white in the first game only.
+    self.assertEqual([result.a_color for result in results], ['w', 'b'])
+    # Both openings leave white to move, so white's player makes the first search.
+    self.assertEqual([result.search_stats[0].player for result in results], ['a', 'b'])
+    self.assertEqual([result.reason for result in results], ['move limit', 'move limit'])
+
+  def test_fen_opening(self):
+    result = play_game('7k/8/8/8/8/8/R7/1R5K w - - 0 1', {'depth': 2}, {'depth': 1}, True, 20, 0)
+    self.assertEqual((result.score, result.reason), (1.0, 'checkmate'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,90 @@
+import sys
+import os
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from move import Move
+from transposition import SharedTranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+
+class TestSharedTranspositionTable(unittest.TestCase):
+  def setUp(self):
+    self.table = SharedTranspositionTable(size_mb=1)
+
+  def tearDown(self):
+    self.table.close()
+
+  def test_store_and_probe(self):
+    move = Move(4, 6, 4, 4)
+    key = (1 << 63) + 1234
+    self.table.store(key, 3, -6.9, LOWER_BOUND, move)
+
+    entry = self.table.probe(key)
+    self.assertIsNotNone(entry)
+    self.assertEqual(entry.depth, 3)
+    self.assertEqual(entry.score, -6.9)
+    self.assertEqual(entry.bound, LOWER_BOUND)
+    self.assertEqual(entry.move, move)
+
+    self.table.store(key, 4, 10000, EXACT, None)
+    entry = self.table.probe(key)
+    self.assertEqual(entry.score, 10000)
+    self.assertIsNone(entry.move)
+
+    self.assertIsNone(self.table.probe(4321))
+    self.assertEqual(self.table.hit_rate, 2 / 3)
+
+  def test_depth_preferred_replacement(self):
+    buckets = self.table.buckets
+    deep_key, shallow_key, other_key = 7, 7 + buckets, 7 + 2 * buckets
+
+    self.table.store(deep_key, 5, 1, LOWER_BOUND, None)
+    self.table.store(shallow_key, 2, 2, UPPER_BOUND, None)
+    self.assertEqual(self.table.probe(deep_key).depth, 5)
+    self.assertEqual(self.table.probe(shallow_key).depth, 2)
+
+    self.table.store(other_key, 1, 3, EXACT, None)
+    self.assertIsNone(self.table.probe(shallow_key))
+    self.assertEqual(self.table.probe(deep_key).depth, 5)
+    self.assertEqual(len(self.table), 2)
+
+  def test_attach_by_name(self):
+    self.table.store(99, 2, 0.5, EXACT, Move(1, 7, 2, 5))
+    attached = SharedTranspositionTable(size_mb=1, name=self.table.name)
+    try:
+      self.assertEqual(attached.probe(99).move, Move(1, 7, 2, 5))
+      attached.store(100, 1, 0.25, UPPER_BOUND, None)
+      self.assertEqual(self.table.probe(100).score, 0.25)
+    finally:
+      attached.close()
+
+  def test_torn_entry_is_a_miss(self):
+    self.table.store(99, 2, 0.5, EXACT, None)
+    slot = (99 % self.table.buckets) << 1
+    # Another process got halfway through writing a different entry into the same slot.
+    self.table.words[(slot << 1) + 1] ^= 1 << 32
+    self.assertIsNone(self.table.probe(99))
+
+  def test_search_score_matches_plain_search(self):
+    board = Board()
+    engine = Engine(board)
+    board.make_move(Move(3, 6, 3, 4))
+    engine.refresh_moves_and_game_state('b')
+
+    plain = Ai(depth=3, tt_size_mb=0)
+    shared = Ai(depth=3, tt_size_mb=0)
+    shared.transposition_table = self.table
+    plain_score = plain.find_alpha_beta_prune_move(list(engine.black_moves), engine, 3, -10000, 10000, -1)
+    shared_score = shared.find_alpha_beta_prune_move(list(engine.black_moves), engine, 3, -10000, 10000, -1)
+    self.assertEqual(plain_score, shared_score)
+    self.assertGreater(self.table.stores, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import os
+import unittest
+from random import seed
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai import Ai
+from board import Board
+from engine import Engine
+from move import Move
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+
+class TestTranspositionTable(unittest.TestCase):
+  def setUp(self):
+    self.table = TranspositionTable(size_mb=1)
+
+  def test_store_and_probe(self):
+    move = Move(4, 6, 4, 4)
+    self.table.store(1234, 3, 0.5, EXACT, move)
+
+    entry = self.table.probe(1234)
+    self.assertIsNotNone(entry)
+    self.assertEqual(entry.depth, 3)
+    self.assertEqual(entry.score, 0.5)
+    self.assertEqual(entry.bound, EXACT)
+    self.assertEqual(entry.move, move)
+
+    self.assertIsNone(self.table.probe(4321))
+    self.assertEqual(self.table.probes, 2)
+    self.assertEqual(self.table.hits, 1)
+    self.assertEqual(self.table.hit_rate, 0.5)
+
+  def test_depth_preferred_replacement(self):
+    buckets = self.table.buckets
+    deep_key, shallow_key, other_key = 7, 7 + buckets, 7 + 2 * buckets
+
+    self.table.store(deep_key, 5, 1, LOWER_BOUND, None)
+    # A shallower search of a colliding position goes to the always-replace slot.
+    self.table.store(shallow_key, 2, 2, UPPER_BOUND, None)
+    self.assertEqual(self.table.probe(deep_key).depth, 5)
+    self.assertEqual(self.table.probe(shallow_key).depth, 2)
+
+    # The always-replace slot gives way to the next colliding store.
+    self.table.store(other_key, 1, 3, EXACT, None)
+    self.assertIsNone(self.table.probe(shallow_key))
+    self.assertEqual(self.table.probe(deep_key).depth, 5)
+    self.assertEqual(self.table.probe(other_key).depth, 1)
+
+    # A deeper search takes over the depth-preferred slot.
+    self.table.store(other_key + buckets, 6, 4, EXACT, None)
+    self.assertIsNone(self.table.probe(deep_key))
+    self.assertEqual(self.table.overwrites, 2)
+
+  def test_clear(self):
+    self.table.store(1, 1, 0, EXACT, None)
+    self.assertEqual(len(self.table), 1)
+    self.table.clear()
+    self.assertEqual(len(self.table), 0)
+    self.assertEqual(self.table.stores, 0)
+
+  def test_search_uses_table(self):
+    seed(0)
+    board = Board()
+    engine = Engine(board)
+    board.make_move(Move(4, 6, 4, 4))
+    engine.refresh_moves_and_game_state('b')
+
+    ai = Ai(depth=3)
+    ai.find_optimal_move(engine)
+    self.assertGreater(ai.transposition_table.stores, 0)
+
+    # Searching the same position again is answered mostly from the table.
+    nodes = ai.nodes
+    ai.find_optimal_move(engine)
+    self.assertLess(ai.nodes, nodes)
+    self.assertGreater(ai.transposition_table.hits, 0)
+
+  def test_search_score_matches_plain_search(self):
+    board = Board()
+    engine = Engine(board)
+    board.make_move(Move(3, 6, 3, 4))
+    engine.refresh_moves_and_game_state('b')
+
+    plain = Ai(depth=3, tt_size_mb=0)
+    cached = Ai(depth=3)
+    plain_score = plain.find_alpha_beta_prune_move(list(engine.black_moves), engine, 3, -10000, 10000, -1)
+    cached_score = cached.find_alpha_beta_prune_move(list(engine.black_moves), engine, 3, -10000, 10000, -1)
+    self.assertEqual(plain_score, cached_score)
+
+  def test_fail_low_after_table_cutoff_is_an_upper_bound(self):
+    board = Board()
+    engine = Engine(board)
+    board.make_move(Move(4, 6, 4, 4))
+    engine.refresh_moves_and_game_state('b')
+
+    ai = Ai(depth=2, null_move=False, lmr=False)
+    # A lower bound black cannot reach raises alpha, so every move fails low against it.
+    ai.transposition_table.store(board.hash, 2, 5, LOWER_BOUND, None)
+    ai.root_depth = 3
+    score = ai.find_alpha_beta_prune_move(list(engine.black_moves), engine, 2, -10000, 10000, -1)
+    self.assertLess(score, 5)
+
+    entry = ai.transposition_table.probe(board.hash)
+    self.assertEqual(entry.score, score)
+    self.assertEqual(entry.bound, UPPER_BOUND)
+
+
+if __name__ == '__main__':
+  unittest.main()
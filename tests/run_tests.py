@@ -9,6 +9,19 @@ from TestKnightMoveGeneration import TestKnightMoveGeneration
 from TestBoardMethods import TestBoardMethods
 from TestChessNotation import TestChessNotation
 from TestGenericMoveGeneration import TestGenericMoveGeneration
+from TestBitboards import TestBitboards
+from TestTranspositionTable import TestTranspositionTable
+from TestAiSearch import TestAiSearch
+from TestMoveOrdering import TestMoveOrdering
+from TestPerft import TestPerft
+from TestParallelSearch import TestParallelSearch
+from TestSharedTranspositionTable import TestSharedTranspositionTable
+from TestSelfPlay import TestSelfPlay
+from TestReplay import TestReplay
+from TestOpeningBook import TestOpeningBook
+from TestBitbases import TestBitbases
+from TestBatchEvaluation import TestBatchEvaluation
+from TestSearchStats import TestSearchStats
 
 if __name__ == '__main__':
   test_cases = [
@@ -20,7 +33,20 @@ if __name__ == '__main__':
     TestQueenMoveGeneration,
     TestGenericMoveGeneration,
     TestBoardMethods,
-    TestChessNotation
+    TestChessNotation,
+    TestBitboards,
+    TestTranspositionTable,
+    TestAiSearch,
+    TestMoveOrdering,
+    TestPerft,
+    TestParallelSearch,
+    TestSharedTranspositionTable,
+    TestSelfPlay,
+    TestReplay,
+    TestOpeningBook,
+    TestBitbases,
+    TestBatchEvaluation,
+    TestSearchStats
   ]
 
   test_suite = unittest.TestSuite()
@@ -0,0 +1,191 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, NamedTuple, Optional
+
+from move import Move
+
+# Bound types, relative to the side to move at the stored node.
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high, the score is at least this.
+UPPER_BOUND = 2  # The search failed low, the score is at most this.
+
+# Rough footprint of one stored entry: the tuple itself, the key, the score and the slot pointer.
+ENTRY_BYTES = 144
+
+# Shared entries are two 64-bit words: the key XOR the data, then the data.
+SHARED_ENTRY_BYTES = 16
+# Data layout, lowest bits first: score in hundredths offset by SCORE_OFFSET (32 bits), depth (8 bits),
+# bound (2 bits), move key plus one (13 bits, zero meaning no move).
+SCORE_OFFSET = 1 << 31
+MASK_64 = (1 << 64) - 1
+
+
+class TranspositionEntry(NamedTuple):
+  key: int
+  depth: int
+  score: float
+  bound: int
+  move: Optional[Move]
+
+
+class TranspositionTable:
+  """
+  Fixed-size table of search results keyed by Board.hash.
+  Each bucket holds two entries: a depth-preferred slot that only gives way to deeper (or equal) searches,
+  and an always-replace slot that takes everything else.
+  """
+
+  def __init__(self, size_mb: float = 16):
+    self.buckets = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * 2))
+    self.table: List[Optional[TranspositionEntry]] = [None] * (self.buckets * 2)
+
+    self.probes = 0
+    self.hits = 0
+    self.stores = 0
+    self.overwrites = 0
+
+  def __len__(self) -> int:
+    return sum(1 for entry in self.table if entry is not None)
+
+  def clear(self):
+    self.table = [None] * (self.buckets * 2)
+    self.reset_counters()
+
+  def reset_counters(self):
+    self.probes = self.hits = self.stores = self.overwrites = 0
+
+  @property
+  def hit_rate(self) -> float:
+    return self.hits / self.probes if self.probes else 0.0
+
+  def probe(self, key: int) -> Optional[TranspositionEntry]:
+    self.probes += 1
+    index = (key % self.buckets) << 1
+
+    entry = self.table[index]
+    if entry is not None and entry.key == key:
+      self.hits += 1
+      return entry
+    entry = self.table[index + 1]
+    if entry is not None and entry.key == key:
+      self.hits += 1
+      return entry
+
+    return None
+
+  def store(self, key: int, depth: int, score: float, bound: int, move: Optional[Move]):
+    self.stores += 1
+    index = (key % self.buckets) << 1
+    entry = TranspositionEntry(key, depth, score, bound, move)
+
+    preferred = self.table[index]
+    if preferred is None or preferred.key == key or depth >= preferred.depth:
+      if preferred is not None and preferred.key != key:
+        self.overwrites += 1
+      self.table[index] = entry
+    else:
+      if self.table[index + 1] is not None and self.table[index + 1].key != key:
+        self.overwrites += 1
+      self.table[index + 1] = entry
+
+
+def _pack(depth: int, score: float, bound: int, move: Optional[Move]) -> int:
+  move_bits = move.key + 1 if move is not None else 0
+  return (round(score * 100) + SCORE_OFFSET) | depth << 32 | bound << 40 | move_bits << 42
+
+
+def _unpack(key: int, data: int) -> TranspositionEntry:
+  move_bits = data >> 42
+  return TranspositionEntry(key, data >> 32 & 0xFF, ((data & 0xFFFFFFFF) - SCORE_OFFSET) / 100, data >> 40 & 3,
+                            Move.from_key(move_bits - 1) if move_bits else None)
+
+
+class SharedTranspositionTable:
+  """
+  TranspositionTable stored in shared memory, so that several processes can search with one table.
+  Pass the name of an existing table to attach to it instead of creating a new one.
+
+  Entries are written without locks. Each one keeps the key XOR the data next to the data, so an entry torn
+  by two processes writing at once fails the check on probe and reads as a miss rather than a wrong hit.
+  Scores are stored as integer hundredths and moves by their key, which is all move ordering needs.
+  """
+
+  def __init__(self, size_mb: float = 16, name: Optional[str] = None):
+    self.buckets = max(1, int(size_mb * 1024 * 1024) // (SHARED_ENTRY_BYTES * 2))
+    if name is None:
+      self.memory = SharedMemory(create=True, size=self.buckets * 2 * SHARED_ENTRY_BYTES)
+    else:
+      self.memory = SharedMemory(name=name)
+    self.owner = name is None
+    self.words = self.memory.buf.cast('Q')
+    if self.owner:
+      self.clear()
+
+    self.probes = 0
+    self.hits = 0
+    self.stores = 0
+    self.overwrites = 0
+
+  @property
+  def name(self) -> str:
+    return self.memory.name
+
+  def __len__(self) -> int:
+    words = self.words
+    return sum(1 for index in range(1, len(words), 2) if words[index])
+
+  def clear(self):
+    self.memory.buf[:] = bytes(len(self.memory.buf))
+    self.reset_counters()
+
+  def reset_counters(self):
+    self.probes = self.hits = self.stores = self.overwrites = 0
+
+  @property
+  def hit_rate(self) -> float:
+    return self.hits / self.probes if self.probes else 0.0
+
+  def close(self):
+    """
+    Detaches from the shared memory, and frees it when this is the table that created it.
+    """
+    self.words.release()
+    self.memory.close()
+    if self.owner:
+      self.memory.unlink()
+
+  def _read(self, slot: int) -> Optional[TranspositionEntry]:
+    data = self.words[(slot << 1) + 1]
+    if not data:
+      return None
+    return _unpack(self.words[slot << 1] ^ data, data)
+
+  def probe(self, key: int) -> Optional[TranspositionEntry]:
+    self.probes += 1
+    words = self.words
+    slot = (key % self.buckets) << 1
+
+    for index in (slot << 1, (slot + 1) << 1):
+      data = words[index + 1]
+      if data and words[index] ^ data == key:
+        self.hits += 1
+        return _unpack(key, data)
+
+    return None
+
+  def store(self, key: int, depth: int, score: float, bound: int, move: Optional[Move]):
+    self.stores += 1
+    slot = (key % self.buckets) << 1
+    data = _pack(depth, score, bound, move)
+
+    preferred = self._read(slot)
+    if preferred is None or preferred.key == key or depth >= preferred.depth:
+      if preferred is not None and preferred.key != key:
+        self.overwrites += 1
+    else:
+      slot += 1
+      other = self._read(slot)
+      if other is not None and other.key != key:
+        self.overwrites += 1
+
+    self.words[slot << 1] = (key ^ data) & MASK_64
+    self.words[(slot << 1) + 1] = data
@@ -0,0 +1,65 @@
+from threading import Event, Thread
+from time import perf_counter
+from typing import Optional
+
+import pygame  # type: ignore
+from ai import Ai
+from engine import Engine
+
+# Posted when the search finishes, with the chosen move as event.move. None when it found none or failed.
+AI_MOVE_EVENT = pygame.USEREVENT + 1
+
+
+class SearchWorker:
+  """
+  Runs the AI search on a background thread, against its own copy of the board,
+  so that the pygame event loop keeps handling events while the AI thinks.
+  """
+
+  def __init__(self, ai: Ai):
+    self.ai = ai
+    self.thread: Optional[Thread] = None
+    self.stop_event = Event()
+    self.started_at = 0.0
+
+  @property
+  def busy(self) -> bool:
+    return self.thread is not None and self.thread.is_alive()
+
+  def start(self, engine: Engine):
+    """
+    Starts searching the position on the engine's board for the AI's side. The board itself is not touched.
+    """
+    search_engine = Engine(engine.board.copy())
+    search_engine.refresh_moves_and_game_state(self.ai.color)
+
+    self.stop_event = Event()
+    self.started_at = perf_counter()
+    self.thread = Thread(target=self.run, args=(search_engine, self.stop_event), daemon=True)
+    self.thread.start()
+
+  def run(self, engine: Engine, stop_event: Event):
+    move = None
+    try:
+      move = self.ai.find_optimal_move(engine, stop_event)
+    finally:
+      # A search that failed still posts, with no move, so that the game does not wait for a reply forever.
+      if not stop_event.is_set():
+        pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=move))
+
+  def progress(self) -> float:
+    """
+    Rough fraction of the search done, by time when there is a time limit and by completed depth otherwise.
+    """
+    if self.ai.time_limit:
+      return min(1.0, (perf_counter() - self.started_at) / self.ai.time_limit)
+    return self.ai.completed_depth / self.ai.depth if self.ai.depth else 1.0
+
+  def cancel(self):
+    """
+    Stops the running search, if any, and waits for the thread to finish. No move is posted.
+    """
+    self.stop_event.set()
+    if self.thread is not None:
+      self.thread.join()
+      self.thread = None
@@ -0,0 +1,11 @@
+from random import Random
+from typing import Dict, List
+
+from bitboard import PIECES
+
+# A fixed seed keeps keys stable between runs and processes, so they can be stored on disk or shared.
+_random = Random(0x7E0A5C)
+
+ZOBRIST_PIECES: Dict[str, List[int]] = {piece: [_random.getrandbits(64) for _ in range(64)] for piece in PIECES}
+# Toggled in whenever black is to move.
+ZOBRIST_BLACK_TO_MOVE = _random.getrandbits(64)